@@ -1,43 +1,13 @@
 import streamlit as st
-import pyodbc as pyod
 import pandas as pd
 import plotly.express as px
 import numpy as np
 
-# Define the connection string
-connection_str = (
-    "Driver={ODBC Driver 17 for SQL Server};"
-    "Server=AGILEDB\\DEV2019;"
-    "Database=UON;"
-    "Uid=erp;"
-    "Pwd=Pass@7046.;"
-)
-
-# Connect to the database
-connection = pyod.connect(connection_str)
-cursor = connection.cursor()
-
-# Read data from the database
-G_LEntry = pd.read_sql(
-    """
-    SELECT *, b.[G_L Account No_] 
-    FROM [UON PEN RBS$G_L Entry$7d966dd5-a317-4db2-b529-926bbce15abf] a
-    JOIN [UON PEN RBS$G_L Entry$437dbf0e-84ff-417a-965d-ed2bb9650972] b
-    ON a.[Entry No_] = b.[Entry No_]
-    """, 
-    connection
-)
-
-# Function to rename duplicate columns
-def rename_duplicate_columns(df):
-    cols = pd.Series(df.columns)
-    for dup in cols[cols.duplicated()].unique():
-        cols[cols[cols == dup].index.values.tolist()] = [dup + '_' + str(i) if i != 0 else dup for i in range(sum(cols == dup))]
-    df.columns = cols
-    return df
-
-# Rename duplicate columns in G_LEntry DataFrame
-G_LEntry = rename_duplicate_columns(G_LEntry)
+from invest_common.dtypes import describe_memory_report
+from invest_common.formatting import format_number_labels
+from invest_common.ledger import LEDGER_COLUMNS
+from invest_common.refresh import describe_refreshed_at, get_ledger_refresher
+from invest_common.rollups import cached_ledger_preview, cached_rollup
 
 # Define the investment type mapping
 investment_type_mapping = {
@@ -50,35 +20,33 @@ investment_type_mapping = {
     "120-0005": "Unquoted Equities"
 }
 
-# Create Investment Type column
-G_LEntry['Investment Type'] = G_LEntry['G_L Account No_'].map(investment_type_mapping).fillna('Other')
+# Optionally let the database produce the summary tables instead of loading the ledger
+server_side_aggregation = st.sidebar.checkbox('Aggregate on the database server')
 
-# Filter out "Other" investment type
-G_LEntry_filtered = G_LEntry[G_LEntry['Investment Type'] != 'Other']
+if server_side_aggregation:
+    # Create a summary table grouping by Investment Type and summing AmtExt on the server;
+    # rollups are reused across reruns for a few minutes
+    summary = cached_rollup('type', investment_type_mapping)
+else:
+    # Read the investment accounts from the ledger shared by every session; it is refreshed in the background
+    ledger_refresher = get_ledger_refresher()
+    ledger = ledger_refresher.dataset(LEDGER_COLUMNS, investment_type_mapping)
+    st.sidebar.caption(describe_refreshed_at(ledger, ledger_refresher.last_error))
+    G_LEntry = ledger.G_LEntry
+    if ledger.memory_report is not None:
+        st.sidebar.caption(describe_memory_report(ledger.memory_report))
 
-# Convert PDateExt to datetime
-G_LEntry_filtered['PDateExt'] = pd.to_datetime(G_LEntry_filtered['PDateExt'], errors='coerce')
+    # The shared ledger is already enriched with Investment Type, Year, Month and Quarter
+    G_LEntry_filtered = ledger.G_LEntry_filtered
 
-# Extract year, month, and quarter from PDateExt
-G_LEntry_filtered['Year'] = G_LEntry_filtered['PDateExt'].dt.year
-G_LEntry_filtered['Month'] = G_LEntry_filtered['PDateExt'].dt.month
-G_LEntry_filtered['Quarter'] = G_LEntry_filtered['PDateExt'].dt.to_period('Q')
+    # The summary cube is built once per data load; the summary tables are answered from it
+    ledger_cube = ledger.cube
 
-# Create a summary table grouping by Investment Type and summing AmtExt
-summary = G_LEntry_filtered.groupby('Investment Type')['AmtExt'].sum().reset_index()
+    # Create a summary table grouping by Investment Type and summing AmtExt
+    summary = ledger_cube.rollup('type')
 
 # Format AmtExt values for better readability
-def format_large_numbers(num):
-    if num >= 1_000_000_000:
-        return f'{num/1_000_000_000:.2f}B'
-    elif num >= 1_000_000:
-        return f'{num/1_000_000:.2f}M'
-    elif num >= 1_000:
-        return f'{num/1_000:.2f}K'
-    else:
-        return str(num)
-
-summary['Formatted AmtExt'] = summary['AmtExt'].apply(format_large_numbers)
+summary['Formatted AmtExt'] = format_number_labels(summary['AmtExt'])
 
 # Display the summary table
 st.write("Investment Summary Table:")
@@ -110,12 +78,20 @@ st.plotly_chart(pie_chart)
 
 # Displaying the filtered DataFrame with year, month, and quarter
 st.write("Filtered DataFrame with Year, Month, and Quarter:")
-st.dataframe(G_LEntry_filtered.head(10))
-
-# Summary tables by year, month, and quarter
-year_summary = G_LEntry_filtered.groupby(['Year', 'Investment Type'])['AmtExt'].sum().reset_index()
-month_summary = G_LEntry_filtered.groupby(['Year', 'Month', 'Investment Type'])['AmtExt'].sum().reset_index()
-quarter_summary = G_LEntry_filtered.groupby(['Year', 'Quarter', 'Investment Type'])['AmtExt'].sum().reset_index()
+if server_side_aggregation:
+    st.dataframe(cached_ledger_preview(investment_type_mapping))
+
+    # Summary tables by year, month, and quarter, grouped on the server
+    year_summary = cached_rollup('year', investment_type_mapping)
+    month_summary = cached_rollup('month', investment_type_mapping)
+    quarter_summary = cached_rollup('quarter', investment_type_mapping)
+else:
+    st.dataframe(G_LEntry_filtered.head(10))
+
+    # Summary tables by year, month, and quarter
+    year_summary = ledger_cube.rollup('year')
+    month_summary = ledger_cube.rollup('month')
+    quarter_summary = ledger_cube.rollup('quarter')
 
 st.write("Summary by Year:")
 st.dataframe(year_summary)
@@ -1,43 +1,16 @@
 import streamlit as st
-import pyodbc as pyod
 import pandas as pd
 import plotly.express as px
 import numpy as np
+import os
+import sys
 
-# Define the connection string
-connection_str = (
-    "Driver={ODBC Driver 17 for SQL Server};"
-    "Server=AGILEDB\\DEV2019;"
-    "Database=UON;"
-    "Uid=erp;"
-    "Pwd=Pass@7046.;"
-)
-
-# Connect to the database
-connection = pyod.connect(connection_str)
-cursor = connection.cursor()
-
-# Read data from the database
-G_LEntry = pd.read_sql(
-    """
-    SELECT *, b.[G_L Account No_] 
-    FROM [UON PEN RBS$G_L Entry$7d966dd5-a317-4db2-b529-926bbce15abf] a
-    JOIN [UON PEN RBS$G_L Entry$437dbf0e-84ff-417a-965d-ed2bb9650972] b
-    ON a.[Entry No_] = b.[Entry No_]
-    """, 
-    connection
-)
-
-# Function to rename duplicate columns
-def rename_duplicate_columns(df):
-    cols = pd.Series(df.columns)
-    for dup in cols[cols.duplicated()].unique():
-        cols[cols[cols == dup].index.values.tolist()] = [dup + '_' + str(i) if i != 0 else dup for i in range(sum(cols == dup))]
-    df.columns = cols
-    return df
-
-# Rename duplicate columns in G_LEntry DataFrame
-G_LEntry = rename_duplicate_columns(G_LEntry)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from invest_common.dtypes import describe_memory_report
+from invest_common.formatting import format_number_labels
+from invest_common.ledger import LEDGER_COLUMNS
+from invest_common.refresh import describe_refreshed_at, get_ledger_refresher
+from invest_common.rollups import cached_ledger_preview, cached_rollup
 
 # Define the investment type mapping
 investment_type_mapping = {
@@ -50,45 +23,47 @@ investment_type_mapping = {
     "120-0005": "Unquoted Equities"
 }
 
-# Create Investment Type column
-G_LEntry['Investment Type'] = G_LEntry['G_L Account No_'].map(investment_type_mapping).fillna('Other')
+# Optionally let the database produce the summary tables instead of loading the ledger
+server_side_aggregation = st.sidebar.checkbox('Aggregate on the database server')
+
+if server_side_aggregation:
+    # Create a summary table grouping by Investment Type and summing AmtExt on the server;
+    # rollups are reused across reruns for a few minutes
+    summary = cached_rollup('type', investment_type_mapping)
 
-# Filter out "Other" investment type
-G_LEntry_filtered = G_LEntry[G_LEntry['Investment Type'] != 'Other']
+    # The quarterly rollup holds every investment type, year and quarter for the filters
+    filter_options = cached_rollup('quarter', investment_type_mapping)
+else:
+    # Read the investment accounts from the ledger shared by every session; it is refreshed in the background
+    ledger_refresher = get_ledger_refresher()
+    ledger = ledger_refresher.dataset(LEDGER_COLUMNS, investment_type_mapping)
+    st.sidebar.caption(describe_refreshed_at(ledger, ledger_refresher.last_error))
+    G_LEntry = ledger.G_LEntry
+    if ledger.memory_report is not None:
+        st.sidebar.caption(describe_memory_report(ledger.memory_report))
 
-# Convert PDateExt to datetime
-G_LEntry_filtered['PDateExt'] = pd.to_datetime(G_LEntry_filtered['PDateExt'], errors='coerce')
+    # The shared ledger is already enriched with Investment Type, Year, Month and Quarter
+    G_LEntry_filtered = ledger.G_LEntry_filtered
 
-# Extract year, month, and quarter from PDateExt
-G_LEntry_filtered['Year'] = G_LEntry_filtered['PDateExt'].dt.year
-G_LEntry_filtered['Month'] = G_LEntry_filtered['PDateExt'].dt.month
-G_LEntry_filtered['Quarter'] = G_LEntry_filtered['PDateExt'].dt.to_period('Q')
+    # The summary cube is built once per data load; the summary tables and filters are answered from it
+    ledger_cube = ledger.cube
 
-# Create a summary table grouping by Investment Type and summing AmtExt
-summary = G_LEntry_filtered.groupby('Investment Type')['AmtExt'].sum().reset_index()
+    # Create a summary table grouping by Investment Type and summing AmtExt
+    summary = ledger_cube.rollup('type')
+    filter_options = ledger_cube.rollup('quarter')
 
 # Format AmtExt values for better readability
-def format_large_numbers(num):
-    if num >= 1_000_000_000:
-        return f'{num/1_000_000_000:.2f}B'
-    elif num >= 1_000_000:
-        return f'{num/1_000_000:.2f}M'
-    elif num >= 1_000:
-        return f'{num/1_000:.2f}K'
-    else:
-        return str(num)
-
-summary['Formatted AmtExt'] = summary['AmtExt'].apply(format_large_numbers)
+summary['Formatted AmtExt'] = format_number_labels(summary['AmtExt'])
 
 # Sidebar filters
 st.sidebar.header('Filters')
 investment_type = st.sidebar.selectbox(
     'Select Investment Type', 
-    options=['All'] + list(G_LEntry_filtered['Investment Type'].unique())
+    options=['All'] + list(filter_options['Investment Type'].unique())
 )
 year = st.sidebar.selectbox(
     'Select Year', 
-    options=['All'] + list(G_LEntry_filtered['Year'].unique())
+    options=['All'] + list(filter_options['Year'].unique())
 )
 month = st.sidebar.selectbox(
     'Select Month', 
@@ -96,73 +71,78 @@ month = st.sidebar.selectbox(
 )
 quarter = st.sidebar.selectbox(
     'Select Quarter', 
-    options=['All'] + list(G_LEntry_filtered['Quarter'].unique().astype(str))
+    options=['All'] + list(filter_options['Quarter'].unique().astype(str))
 )
 
-# Filter the data based on selections
-filtered_data = G_LEntry_filtered.copy()
-if investment_type != 'All':
-    filtered_data = filtered_data[filtered_data['Investment Type'] == investment_type]
-
-if year != 'All':
-    filtered_data = filtered_data[filtered_data['Year'] == int(year)]
-
-if month != 'All':
-    filtered_data = filtered_data[filtered_data['Month'] == int(month)]
-
-if quarter != 'All':
-    filtered_data = filtered_data[filtered_data['Quarter'].astype(str) == quarter]
+# Filter the data based on selections with a single mask over precomputed codes
+filters = dict(investment_type=investment_type, year=year, month=month, quarter=quarter)
+if not server_side_aggregation:
+    filtered_data = ledger.ledger_filter.apply(G_LEntry_filtered, **filters)
 
 # Display the summary table
 st.title("Investment Dashboard")
 
-tab1, tab2, tab3 = st.tabs(["Summary", "Detailed Data", "Visualizations"])
+# Switching tabs reruns the script, so the tabs that aren't selected can skip their work
+tab1, tab2, tab3 = st.tabs(
+    ["Summary", "Detailed Data", "Visualizations"],
+    key='active_tab', on_change="rerun"
+)
 
 with tab1:
     st.header("Investment Summary Table")
     st.dataframe(summary)
 
 with tab2:
-    st.header("Filtered DataFrame with Year, Month, and Quarter")
-    st.dataframe(filtered_data.head(10))
+    if tab2.open:
+        st.header("Filtered DataFrame with Year, Month, and Quarter")
+        if server_side_aggregation:
+            st.dataframe(cached_ledger_preview(investment_type_mapping, **filters))
+
+            # Summary tables by year, month, and quarter, grouped on the server
+            year_summary = cached_rollup('year', investment_type_mapping, **filters)
+            month_summary = cached_rollup('month', investment_type_mapping, **filters)
+            quarter_summary = cached_rollup('quarter', investment_type_mapping, **filters)
+        else:
+            st.dataframe(filtered_data.head(10))
 
-    # Summary tables by year, month, and quarter
-    year_summary = filtered_data.groupby(['Year', 'Investment Type'])['AmtExt'].sum().reset_index()
-    month_summary = filtered_data.groupby(['Year', 'Month', 'Investment Type'])['AmtExt'].sum().reset_index()
-    quarter_summary = filtered_data.groupby(['Year', 'Quarter', 'Investment Type'])['AmtExt'].sum().reset_index()
+            # Summary tables by year, month, and quarter, rolled up from the cube
+            year_summary = ledger_cube.rollup('year', **filters)
+            month_summary = ledger_cube.rollup('month', **filters)
+            quarter_summary = ledger_cube.rollup('quarter', **filters)
 
-    st.write("Summary by Year:")
-    st.dataframe(year_summary)
+        st.write("Summary by Year:")
+        st.dataframe(year_summary)
 
-    st.write("Summary by Month:")
-    st.dataframe(month_summary)
+        st.write("Summary by Month:")
+        st.dataframe(month_summary)
 
-    st.write("Summary by Quarter:")
-    st.dataframe(quarter_summary)
+        st.write("Summary by Quarter:")
+        st.dataframe(quarter_summary)
 
 with tab3:
-    st.header("Visualizations")
-
-    # Create a bar chart with formatted values
-    bar_chart = px.bar(
-        summary, 
-        x='Investment Type', 
-        y='AmtExt', 
-        text='Formatted AmtExt',
-        title='Investment Type Summary'
-    )
-    bar_chart.update_traces(textposition='outside')
-
-    # Display the bar chart
-    st.plotly_chart(bar_chart)
-
-    # Create a pie chart
-    pie_chart = px.pie(
-        summary, 
-        values='AmtExt', 
-        names='Investment Type', 
-        title='Investment Type Distribution'
-    )
-
-    # Display the pie chart
-    st.plotly_chart(pie_chart)
+    if tab3.open:
+        st.header("Visualizations")
+
+        # Create a bar chart with formatted values
+        bar_chart = px.bar(
+            summary, 
+            x='Investment Type', 
+            y='AmtExt', 
+            text='Formatted AmtExt',
+            title='Investment Type Summary'
+        )
+        bar_chart.update_traces(textposition='outside')
+
+        # Display the bar chart
+        st.plotly_chart(bar_chart)
+
+        # Create a pie chart
+        pie_chart = px.pie(
+            summary, 
+            values='AmtExt', 
+            names='Investment Type', 
+            title='Investment Type Distribution'
+        )
+
+        # Display the pie chart
+        st.plotly_chart(pie_chart)
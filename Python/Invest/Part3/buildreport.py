@@ -1,43 +1,17 @@
 import streamlit as st
-import pyodbc as pyod
 import pandas as pd
 import plotly.express as px
 import numpy as np
+import os
+import sys
 
-# Define the connection string
-connection_str = (
-    "Driver={ODBC Driver 17 for SQL Server};"
-    "Server=AGILEDB\\DEV2019;"
-    "Database=UON;"
-    "Uid=erp;"
-    "Pwd=Pass@7046.;"
-)
-
-# Connect to the database
-connection = pyod.connect(connection_str)
-cursor = connection.cursor()
-
-# Read data from the database
-G_LEntry = pd.read_sql(
-    """
-    SELECT *, b.[G_L Account No_] 
-    FROM [UON PEN RBS$G_L Entry$7d966dd5-a317-4db2-b529-926bbce15abf] a
-    JOIN [UON PEN RBS$G_L Entry$437dbf0e-84ff-417a-965d-ed2bb9650972] b
-    ON a.[Entry No_] = b.[Entry No_]
-    """, 
-    connection
-)
-
-# Function to rename duplicate columns
-def rename_duplicate_columns(df):
-    cols = pd.Series(df.columns)
-    for dup in cols[cols.duplicated()].unique():
-        cols[cols[cols == dup].index.values.tolist()] = [dup + '_' + str(i) if i != 0 else dup for i in range(sum(cols == dup))]
-    df.columns = cols
-    return df
-
-# Rename duplicate columns in G_LEntry DataFrame
-G_LEntry = rename_duplicate_columns(G_LEntry)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from invest_common.charts import build_report_chart
+from invest_common.dtypes import describe_memory_report
+from invest_common.formatting import format_number_labels
+from invest_common.ledger import LEDGER_COLUMNS, report_columns
+from invest_common.refresh import describe_refreshed_at, get_ledger_refresher
+from invest_common.reports import keep_build_report_state
 
 # Define the investment type mapping
 investment_type_mapping = {
@@ -50,45 +24,43 @@ investment_type_mapping = {
     "120-0005": "Unquoted Equities"
 }
 
-# Create Investment Type column
-G_LEntry['Investment Type'] = G_LEntry['G_L Account No_'].map(investment_type_mapping).fillna('Other')
-
-# Filter out "Other" investment type
-G_LEntry_filtered = G_LEntry[G_LEntry['Investment Type'] != 'Other']
-
-# Convert PDateExt to datetime
-G_LEntry_filtered['PDateExt'] = pd.to_datetime(G_LEntry_filtered['PDateExt'], errors='coerce')
-
-# Extract year, month, and quarter from PDateExt
-G_LEntry_filtered['Year'] = G_LEntry_filtered['PDateExt'].dt.year
-G_LEntry_filtered['Month'] = G_LEntry_filtered['PDateExt'].dt.month
-G_LEntry_filtered['Quarter'] = G_LEntry_filtered['PDateExt'].dt.to_period('Q')
+# Read the investment accounts from the ledger shared by every session; it is refreshed in the background.
+# Only the columns the dashboard and its reports use are pulled unless Build Report asks for all of them
+# Build Report widgets aren't drawn while their tab or report is closed, so keep their values
+keep_build_report_state(st.session_state)
+if st.session_state.get('all_ledger_columns'):
+    ledger_columns = None
+else:
+    ledger_columns = LEDGER_COLUMNS + report_columns(st.session_state)
+ledger_refresher = get_ledger_refresher()
+ledger = ledger_refresher.dataset(ledger_columns, investment_type_mapping)
+st.sidebar.caption(describe_refreshed_at(ledger, ledger_refresher.last_error))
+G_LEntry = ledger.G_LEntry
+if ledger.memory_report is not None:
+    st.sidebar.caption(describe_memory_report(ledger.memory_report))
+
+# The shared ledger is already enriched with Investment Type, Year, Month and Quarter
+G_LEntry_filtered = ledger.G_LEntry_filtered
+
+# The summary cube is built once per data load; the summary tables and filters are answered from it
+ledger_cube = ledger.cube
 
 # Create a summary table grouping by Investment Type and summing AmtExt
-summary = G_LEntry_filtered.groupby('Investment Type')['AmtExt'].sum().reset_index()
+summary = ledger_cube.rollup('type')
 
 # Format AmtExt values for better readability
-def format_large_numbers(num):
-    if num >= 1_000_000_000:
-        return f'{num/1_000_000_000:.2f}B'
-    elif num >= 1_000_000:
-        return f'{num/1_000_000:.2f}M'
-    elif num >= 1_000:
-        return f'{num/1_000:.2f}K'
-    else:
-        return str(num)
-
-summary['Formatted AmtExt'] = summary['AmtExt'].apply(format_large_numbers)
-
-# Sidebar filters
+summary['Formatted AmtExt'] = format_number_labels(summary['AmtExt'])
+
+# Sidebar filters, with options taken from the quarterly rollup
+filter_options = ledger_cube.rollup('quarter')
 st.sidebar.header('Filters')
 investment_type = st.sidebar.selectbox(
     'Select Investment Type', 
-    options=['All'] + list(G_LEntry_filtered['Investment Type'].unique())
+    options=['All'] + list(filter_options['Investment Type'].unique())
 )
 year = st.sidebar.selectbox(
     'Select Year', 
-    options=['All'] + list(G_LEntry_filtered['Year'].unique())
+    options=['All'] + list(filter_options['Year'].unique())
 )
 month = st.sidebar.selectbox(
     'Select Month', 
@@ -96,127 +68,115 @@ month = st.sidebar.selectbox(
 )
 quarter = st.sidebar.selectbox(
     'Select Quarter', 
-    options=['All'] + list(G_LEntry_filtered['Quarter'].unique().astype(str))
+    options=['All'] + list(filter_options['Quarter'].unique().astype(str))
 )
 
-# Filter the data based on selections
-filtered_data = G_LEntry_filtered.copy()
-if investment_type != 'All':
-    filtered_data = filtered_data[filtered_data['Investment Type'] == investment_type]
-
-if year != 'All':
-    filtered_data = filtered_data[filtered_data['Year'] == int(year)]
-
-if month != 'All':
-    filtered_data = filtered_data[filtered_data['Month'] == int(month)]
-
-if quarter != 'All':
-    filtered_data = filtered_data[filtered_data['Quarter'].astype(str) == quarter]
+# Filter the data based on selections with a single mask over precomputed codes
+filters = dict(investment_type=investment_type, year=year, month=month, quarter=quarter)
+filtered_data = ledger.ledger_filter.apply(G_LEntry_filtered, **filters)
 
 # Display the summary table
 st.title("Investment Dashboard")
 
-tab1, tab2, tab3, tab4 = st.tabs(["Summary", "Detailed Data", "Visualizations", "Build Report"])
+# Switching tabs reruns the script, so the tabs that aren't selected can skip their work
+tab1, tab2, tab3, tab4 = st.tabs(
+    ["Summary", "Detailed Data", "Visualizations", "Build Report"],
+    key='active_tab', on_change="rerun"
+)
 
 with tab1:
     st.header("Investment Summary Table")
     st.dataframe(summary)
 
 with tab2:
-    st.header("Filtered DataFrame with Year, Month, and Quarter")
-    st.dataframe(filtered_data.head(10))
+    if tab2.open:
+        st.header("Filtered DataFrame with Year, Month, and Quarter")
+        st.dataframe(filtered_data.head(10))
 
-    # Summary tables by year, month, and quarter
-    year_summary = filtered_data.groupby(['Year', 'Investment Type'])['AmtExt'].sum().reset_index()
-    month_summary = filtered_data.groupby(['Year', 'Month', 'Investment Type'])['AmtExt'].sum().reset_index()
-    quarter_summary = filtered_data.groupby(['Year', 'Quarter', 'Investment Type'])['AmtExt'].sum().reset_index()
+        # Summary tables by year, month, and quarter, rolled up from the cube
+        year_summary = ledger_cube.rollup('year', **filters)
+        month_summary = ledger_cube.rollup('month', **filters)
+        quarter_summary = ledger_cube.rollup('quarter', **filters)
 
-    st.write("Summary by Year:")
-    st.dataframe(year_summary)
+        st.write("Summary by Year:")
+        st.dataframe(year_summary)
 
-    st.write("Summary by Month:")
-    st.dataframe(month_summary)
+        st.write("Summary by Month:")
+        st.dataframe(month_summary)
 
-    st.write("Summary by Quarter:")
-    st.dataframe(quarter_summary)
+        st.write("Summary by Quarter:")
+        st.dataframe(quarter_summary)
 
 with tab3:
-    st.header("Visualizations")
-
-    # Create a bar chart with formatted values
-    bar_chart = px.bar(
-        summary, 
-        x='Investment Type', 
-        y='AmtExt', 
-        text='Formatted AmtExt',
-        title='Investment Type Summary'
-    )
-    bar_chart.update_traces(textposition='outside')
-
-    # Display the bar chart
-    st.plotly_chart(bar_chart)
-
-    # Create a pie chart
-    pie_chart = px.pie(
-        summary, 
-        values='AmtExt', 
-        names='Investment Type', 
-        title='Investment Type Distribution'
-    )
-
-    # Display the pie chart
-    st.plotly_chart(pie_chart)
+    if tab3.open:
+        st.header("Visualizations")
+
+        # Create a bar chart with formatted values
+        bar_chart = px.bar(
+            summary, 
+            x='Investment Type', 
+            y='AmtExt', 
+            text='Formatted AmtExt',
+            title='Investment Type Summary'
+        )
+        bar_chart.update_traces(textposition='outside')
+
+        # Display the bar chart
+        st.plotly_chart(bar_chart)
+
+        # Create a pie chart
+        pie_chart = px.pie(
+            summary, 
+            values='AmtExt', 
+            names='Investment Type', 
+            title='Investment Type Distribution'
+        )
+
+        # Display the pie chart
+        st.plotly_chart(pie_chart)
 
 with tab4:
-    st.header("Build Your Own Report")
-
-    # Allow users to select chart type
-    chart_type = st.selectbox(
-        "Select Chart Type",
-        options=["Bar Chart", "Line Chart", "Scatter Plot", "Pie Chart"]
-    )
-
-    # Allow users to select X-axis and Y-axis fields
-    x_axis = st.selectbox(
-        "Select X-axis",
-        options=filtered_data.columns
-    )
-    y_axis = st.selectbox(
-        "Select Y-axis",
-        options=filtered_data.columns
-    )
-
-    # Allow users to select the operator
-    operator = st.selectbox(
-        "Select Operator",
-        options=["SUM", "COUNT", "AVERAGE", "MIN", "MAX"]
-    )
-
-    # Checkbox for data labels
-    show_data_labels = st.checkbox("Show Data Labels")
-
-    # Apply the selected operator
-    if operator == "SUM":
-        y_data = filtered_data.groupby(x_axis)[y_axis].sum().reset_index()
-    elif operator == "COUNT":
-        y_data = filtered_data.groupby(x_axis)[y_axis].count().reset_index()
-    elif operator == "AVERAGE":
-        y_data = filtered_data.groupby(x_axis)[y_axis].mean().reset_index()
-    elif operator == "MIN":
-        y_data = filtered_data.groupby(x_axis)[y_axis].min().reset_index()
-    elif operator == "MAX":
-        y_data = filtered_data.groupby(x_axis)[y_axis].max().reset_index()
-
-    # Render the selected chart
-    if chart_type == "Bar Chart":
-        chart = px.bar(y_data, x=x_axis, y=y_axis, title=f'{chart_type} of {y_axis} ({operator}) vs {x_axis}')
-        if show_data_labels:
-            chart.update_traces(text=y_data[y_axis], textposition='outside')
-    elif chart_type == "Line Chart":
-        chart = px.line(y_data, x=x_axis, y=y_axis, title=f'{chart_type} of {y_axis} ({operator}) vs {x_axis}')
-    elif chart_type == "Scatter Plot":
-        chart = px.scatter(y_data, x=x_axis, y=y_axis, title=f'{chart_type} of {y_axis} ({operator}) vs {x_axis}')
-    elif chart_type == "Pie Chart":
-        chart = px.pie(y_data, values=y_axis, names=x_axis, title=f'{chart_type} of {x_axis} ({operator})')
-
-    st.plotly_chart(chart)
\ No newline at end of file
+    if tab4.open:
+        st.header("Build Your Own Report")
+
+        # Pull every ledger column instead of just the ones the reports already use
+        st.checkbox("Load all ledger columns", key='all_ledger_columns')
+        st.caption(ledger.aggregates.describe())
+
+        # Allow users to select chart type
+        chart_type = st.selectbox(
+            "Select Chart Type",
+            options=["Bar Chart", "Line Chart", "Scatter Plot", "Pie Chart"],
+            key='chart_type'
+        )
+
+        # Allow users to select X-axis and Y-axis fields
+        x_axis = st.selectbox(
+            "Select X-axis",
+            options=filtered_data.columns,
+            key='x_axis'
+        )
+        y_axis = st.selectbox(
+            "Select Y-axis",
+            options=filtered_data.columns,
+            key='y_axis'
+        )
+
+        # Allow users to select the operator
+        operator = st.selectbox(
+            "Select Operator",
+            options=["SUM", "COUNT", "AVERAGE", "MIN", "MAX"],
+            key='operator'
+        )
+
+        # Checkbox for data labels
+        show_data_labels = st.checkbox("Show Data Labels", key='show_data_labels')
+
+        # Apply the selected operator, reusing the result while the selection and filters are unchanged
+        y_data = ledger.aggregates.aggregate(filtered_data, x_axis, y_axis, operator, tuple(filters.items()))
+
+        # Render the selected chart; high-cardinality x-axes are reduced, large line and scatter
+        # charts get compact WebGL traces, and the figure is kept within the payload budget
+        chart = build_report_chart(y_data, chart_type, x_axis, y_axis, operator, show_data_labels, "Actual Values")
+
+        st.plotly_chart(chart)
\ No newline at end of file
@@ -1,49 +1,27 @@
 import streamlit as st
-import pyodbc as pyod
 import pandas as pd
 import plotly.express as px
 import numpy as np
-
-# Define the connection string
-connection_str = (
-    "Driver={ODBC Driver 17 for SQL Server};"
-    "Server=AGILEDB\\DEV2019;"
-    "Database=UON;"
-    "Uid=erp;"
-    "Pwd=Pass@7046.;"
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from invest_common.aggregates import planned_aggregations
+from invest_common.catalog import check_table_budget, get_table_catalog
+from invest_common.charts import build_report_chart
+from invest_common.dtypes import describe_memory_report
+from invest_common.formatting import format_large_numbers, format_number_labels
+from invest_common.ledger import LEDGER_COLUMNS, report_columns
+from invest_common.refresh import describe_refreshed_at, get_ledger_refresher
+from invest_common.relationships import (
+    JOIN_TYPES, check_join_budget, estimate_join, join_tables, preview_join, relationship_definition
 )
-
-# Connect to the database
-connection = pyod.connect(connection_str)
-cursor = connection.cursor()
-
-# Read data from the database
-G_LEntry = pd.read_sql(
-    """
-    SELECT *, b.[G_L Account No_] 
-    FROM [UON PEN RBS$G_L Entry$7d966dd5-a317-4db2-b529-926bbce15abf] a
-    JOIN [UON PEN RBS$G_L Entry$437dbf0e-84ff-417a-965d-ed2bb9650972] b
-    ON a.[Entry No_] = b.[Entry No_]
-    """, 
-    connection
+from invest_common.reports import (
+    keep_build_report_state, load_report_state, new_report, report_is_open, save_report_state
 )
 
-# Sample additional tables for demonstration (replace with your actual table data)
-# For simplicity, here we're using a subset of the G_LEntry table as additional tables
-# Replace these with actual tables from your database or other sources as needed
-Other_Table_1 = G_LEntry.sample(10)
-Other_Table_2 = G_LEntry.sample(10)
-
-# Function to rename duplicate columns
-def rename_duplicate_columns(df):
-    cols = pd.Series(df.columns)
-    for dup in cols[cols.duplicated()].unique():
-        cols[cols[cols == dup].index.values.tolist()] = [dup + '_' + str(i) if i != 0 else dup for i in range(sum(cols == dup))]
-    df.columns = cols
-    return df
-
-# Rename duplicate columns in G_LEntry DataFrame
-G_LEntry = rename_duplicate_columns(G_LEntry)
+# Saved Build Report definitions
+REPORTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reports.json')
 
 # Define the investment type mapping
 investment_type_mapping = {
@@ -56,45 +34,48 @@ investment_type_mapping = {
     "120-0005": "Unquoted Equities"
 }
 
-# Create Investment Type column
-G_LEntry['Investment Type'] = G_LEntry['G_L Account No_'].map(investment_type_mapping).fillna('Other')
-
-# Filter out "Other" investment type
-G_LEntry_filtered = G_LEntry[G_LEntry['Investment Type'] != 'Other']
-
-# Convert PDateExt to datetime
-G_LEntry_filtered['PDateExt'] = pd.to_datetime(G_LEntry_filtered['PDateExt'], errors='coerce')
-
-# Extract year, month, and quarter from PDateExt
-G_LEntry_filtered['Year'] = G_LEntry_filtered['PDateExt'].dt.year
-G_LEntry_filtered['Month'] = G_LEntry_filtered['PDateExt'].dt.month
-G_LEntry_filtered['Quarter'] = G_LEntry_filtered['PDateExt'].dt.to_period('Q')
+# Read the investment accounts from the ledger shared by every session; it is refreshed in the background.
+# Only the columns the dashboard and its reports use are pulled unless Build Report asks for all of them
+# Build Report widgets aren't drawn while their tab or report is closed, so keep their values
+keep_build_report_state(st.session_state)
+if st.session_state.get('all_ledger_columns'):
+    ledger_columns = None
+else:
+    ledger_columns = LEDGER_COLUMNS + report_columns(st.session_state)
+ledger_refresher = get_ledger_refresher()
+ledger = ledger_refresher.dataset(ledger_columns, investment_type_mapping)
+st.sidebar.caption(describe_refreshed_at(ledger, ledger_refresher.last_error))
+G_LEntry = ledger.G_LEntry
+if ledger.memory_report is not None:
+    st.sidebar.caption(describe_memory_report(ledger.memory_report))
+
+# Tables Data Modeling can join: the dashboard's own ledger, then the database tables in the catalog.
+# Opening the tab only reads the catalog's schemas and row counts; a table is loaded when a relationship uses it
+model_tables = {"G_LEntry": G_LEntry}
+table_catalog = get_table_catalog()
+
+# The shared ledger is already enriched with Investment Type, Year, Month and Quarter
+G_LEntry_filtered = ledger.G_LEntry_filtered
+
+# The summary cube is built once per data load; the summary tables and filters are answered from it
+ledger_cube = ledger.cube
 
 # Create a summary table grouping by Investment Type and summing AmtExt
-summary = G_LEntry_filtered.groupby('Investment Type')['AmtExt'].sum().reset_index()
+summary = ledger_cube.rollup('type')
 
 # Format AmtExt values for better readability
-def format_large_numbers(num):
-    if num >= 1_000_000_000:
-        return f'{num/1_000_000_000:.2f}b'
-    elif num >= 1_000_000:
-        return f'{num/1_000_000:.2f}M'
-    elif num >= 1_000:
-        return f'{num/1_000:.2f}K'
-    else:
-        return str(num)
-
-summary['Formatted AmtExt'] = summary['AmtExt'].apply(format_large_numbers)
-
-# Sidebar filters
+summary['Formatted AmtExt'] = format_number_labels(summary['AmtExt'])
+
+# Sidebar filters, with options taken from the quarterly rollup
+filter_options = ledger_cube.rollup('quarter')
 st.sidebar.header('Filters')
 investment_type = st.sidebar.selectbox(
     'Select Investment Type', 
-    options=['All'] + list(G_LEntry_filtered['Investment Type'].unique())
+    options=['All'] + list(filter_options['Investment Type'].unique())
 )
 year = st.sidebar.selectbox(
     'Select Year', 
-    options=['All'] + list(G_LEntry_filtered['Year'].unique())
+    options=['All'] + list(filter_options['Year'].unique())
 )
 month = st.sidebar.selectbox(
     'Select Month', 
@@ -102,251 +83,307 @@ month = st.sidebar.selectbox(
 )
 quarter = st.sidebar.selectbox(
     'Select Quarter', 
-    options=['All'] + list(G_LEntry_filtered['Quarter'].unique().astype(str))
+    options=['All'] + list(filter_options['Quarter'].unique().astype(str))
 )
 
-# Filter the data based on selections
-filtered_data = G_LEntry_filtered.copy()
-if investment_type != 'All':
-    filtered_data = filtered_data[filtered_data['Investment Type'] == investment_type]
-
-if year != 'All':
-    filtered_data = filtered_data[filtered_data['Year'] == int(year)]
-
-if month != 'All':
-    filtered_data = filtered_data[filtered_data['Month'] == int(month)]
-
-if quarter != 'All':
-    filtered_data = filtered_data[filtered_data['Quarter'].astype(str) == quarter]
+# Filter the data based on selections with a single mask over precomputed codes
+filters = dict(investment_type=investment_type, year=year, month=month, quarter=quarter)
+filtered_data = ledger.ledger_filter.apply(G_LEntry_filtered, **filters)
+filter_fingerprint = tuple(filters.items())
+data_version = (ledger.high_water_mark, filter_fingerprint)
 
 # Display the summary table
 st.title("Investment Dashboard")
 
-tab1, tab2, tab3, tab4, tab5 = st.tabs(["Summary", "Data Modeling", "Detailed Data", "Visualizations", "Build Report"])
+# Switching tabs reruns the script, so the tabs that aren't selected can skip their work
+tab1, tab2, tab3, tab4, tab5 = st.tabs(
+    ["Summary", "Data Modeling", "Detailed Data", "Visualizations", "Build Report"],
+    key='active_tab', on_change="rerun"
+)
 
 with tab1:
     st.header("Investment Summary Table")
     st.dataframe(summary)
 
-# For storing relationships
+# For storing relationships, as join definitions; the joins run only when their rows are shown
 if 'relationships' not in st.session_state:
     st.session_state['relationships'] = []
 
 with tab2:
-    st.header("Data Modeling")
+    if tab2.open:
+        st.header("Data Modeling")
+
+        # Keep the form open through its own reruns until a relationship is created
+        if st.button("Add New Relationship"):
+            st.session_state['relationship_form_open'] = True
+
+        if st.session_state.get('relationship_form_open'):
+            # Tables are picked outside the form so its column lists follow them
+            table_names = list(model_tables) + table_catalog.names()
 
-    if st.button("Add New Relationship"):
-        with st.form(key='relationship_form'):
             # Select left table
             left_table_name = st.selectbox(
                 "Select Left Table",
-                options=["G_LEntry", "Other_Table_1", "Other_Table_2"]
+                options=table_names
             )
 
             # Select right table
             right_table_name = st.selectbox(
                 "Select Right Table",
-                options=["G_LEntry", "Other_Table_1", "Other_Table_2"]
+                options=table_names
             )
 
-            # Load selected tables
-            left_table = globals()[left_table_name]
-            right_table = globals()[right_table_name]
-
-            # Select common columns for joining
-            left_column = st.selectbox(
-                "Select Column from Left Table",
-                options=left_table.columns
-            )
-            right_column = st.selectbox(
-                "Select Column from Right Table",
-                options=right_table.columns
+            # Columns come from the catalog's schemas, without loading the tables
+            left_columns = (
+                model_tables[left_table_name].columns if left_table_name in model_tables
+                else table_catalog.columns(left_table_name)
             )
-
-            # Select join type
-            join_type = st.selectbox(
-                "Select Join Type",
-                options=["inner", "left", "right", "outer"]
+            right_columns = (
+                model_tables[right_table_name].columns if right_table_name in model_tables
+                else table_catalog.columns(right_table_name)
             )
 
-            # Submit button for the form
-            submit_button = st.form_submit_button(label='Create Relationship')
+            with st.form(key='relationship_form'):
+                # Select common columns for joining
+                left_column = st.selectbox(
+                    "Select Column from Left Table",
+                    options=left_columns
+                )
+                right_column = st.selectbox(
+                    "Select Column from Right Table",
+                    options=right_columns
+                )
 
-            if submit_button:
-                joined_table = pd.merge(
-                    left_table, 
-                    right_table, 
-                    left_on=left_column, 
-                    right_on=right_column, 
-                    how=join_type
+                # Select join type
+                join_type = st.selectbox(
+                    "Select Join Type",
+                    options=JOIN_TYPES
                 )
-                relationship = {
-                    "left_table": left_table_name,
-                    "right_table": right_table_name,
-                    "left_column": left_column,
-                    "right_column": right_column,
-                    "join_type": join_type,
-                    "joined_table": joined_table
-                }
-                st.session_state['relationships'].append(relationship)
-                st.success("Relationship created successfully!")
-                st.experimental_rerun()
-
-    st.write("Existing Relationships:")
-    for i, relationship in enumerate(st.session_state['relationships']):
-        st.write(f"Relationship {i+1}: {relationship['left_table']} [{relationship['left_column']}] {relationship['join_type']} JOIN {relationship['right_table']} [{relationship['right_column']}]")
-        st.dataframe(relationship['joined_table'].head(10))
+
+                # Submit button for the form
+                submit_button = st.form_submit_button(label='Create Relationship')
+
+                if submit_button:
+                    relationship = relationship_definition(
+                        left_table_name, right_table_name, left_column, right_column, join_type
+                    )
+                    try:
+                        # Tables over the size budget are refused by the load; large ones are flagged first
+                        for table_name in dict.fromkeys([left_table_name, right_table_name]):
+                            if table_name not in model_tables:
+                                status, message = check_table_budget(table_catalog.info()[table_name])
+                                if status == "warning":
+                                    st.warning(message)
+                        # Load the tables now that a relationship uses them
+                        with st.spinner("Loading tables..."):
+                            left_table = (
+                                model_tables[left_table_name] if left_table_name in model_tables
+                                else table_catalog.load(left_table_name)
+                            )
+                            right_table = (
+                                model_tables[right_table_name] if right_table_name in model_tables
+                                else table_catalog.load(right_table_name)
+                            )
+                        # Joining a few rows shows whether the columns can be joined at all
+                        preview_join(left_table, right_table, relationship, key_indexes=ledger.key_indexes)
+                    except (TypeError, ValueError) as error:
+                        st.error(f"Can't join {left_column} to {right_column}: {error}")
+                    else:
+                        st.session_state['relationships'].append(relationship)
+                        st.session_state['relationship_form_open'] = False
+                        st.success("Relationship created successfully!")
+
+                        # Size the full join from the key histograms before anyone asks for it
+                        estimate = estimate_join(left_table, right_table, relationship, key_indexes=ledger.key_indexes)
+                        status, message = check_join_budget(estimate)
+                        if status != "success":
+                            st.warning(message)
+
+        st.write("Available Tables:")
+        st.dataframe(table_catalog.overview())
+        for name, error in table_catalog.errors.items():
+            st.warning(f"{name} is unavailable: {error}")
+
+        st.write("Existing Relationships:")
+        for i, relationship in enumerate(st.session_state['relationships']):
+            left_table = (
+                model_tables[relationship['left_table']] if relationship['left_table'] in model_tables
+                else table_catalog.load(relationship['left_table'])
+            )
+            right_table = (
+                model_tables[relationship['right_table']] if relationship['right_table'] in model_tables
+                else table_catalog.load(relationship['right_table'])
+            )
+            st.write(f"Relationship {i+1}: {relationship['left_table']} [{relationship['left_column']}] {relationship['join_type']} JOIN {relationship['right_table']} [{relationship['right_column']}]")
+            st.dataframe(preview_join(left_table, right_table, relationship, key_indexes=ledger.key_indexes))
+
+            # Joins over the size budget are previewed but never built in full
+            estimate = estimate_join(left_table, right_table, relationship, key_indexes=ledger.key_indexes)
+            status, message = check_join_budget(estimate)
+            if status == "error":
+                st.error(message)
+                continue
+            if status == "warning":
+                st.warning(message)
+            else:
+                st.caption(message)
+
+            # Every joined row is only built when the download is clicked
+            st.download_button(
+                f"Download Relationship {i + 1}",
+                data=lambda left_table=left_table, right_table=right_table, relationship=relationship: (
+                    join_tables(left_table, right_table, relationship, key_indexes=ledger.key_indexes).to_csv(index=False)
+                ),
+                file_name=f"relationship_{i + 1}.csv",
+                mime="text/csv",
+                key=f"download_relationship_{i}"
+            )
 
 with tab3:
-    st.header("Filtered DataFrame with Year, Month, and Quarter")
-    st.dataframe(filtered_data.head(10))
+    if tab3.open:
+        st.header("Filtered DataFrame with Year, Month, and Quarter")
+        st.dataframe(filtered_data.head(10))
 
-    # Summary tables by year, month, and quarter
-    year_summary = filtered_data.groupby(['Year', 'Investment Type'], as_index=False)['AmtExt'].sum()
-    month_summary = filtered_data.groupby(['Year', 'Month', 'Investment Type'], as_index=False)['AmtExt'].sum()
-    quarter_summary = filtered_data.groupby(['Year', 'Quarter', 'Investment Type'], as_index=False)['AmtExt'].sum()
+        # Summary tables by year, month, and quarter, rolled up from the cube
+        year_summary = ledger_cube.rollup('year', **filters)
+        month_summary = ledger_cube.rollup('month', **filters)
+        quarter_summary = ledger_cube.rollup('quarter', **filters)
 
-    st.write("Summary by Year:")
-    st.dataframe(year_summary)
+        st.write("Summary by Year:")
+        st.dataframe(year_summary)
 
-    st.write("Summary by Month:")
-    st.dataframe(month_summary)
+        st.write("Summary by Month:")
+        st.dataframe(month_summary)
 
-    st.write("Summary by Quarter:")
-    st.dataframe(quarter_summary)
+        st.write("Summary by Quarter:")
+        st.dataframe(quarter_summary)
 
 with tab4:
-    st.header("Visualizations")
-
-    # Add cards for key metrics
-    total_investment = filtered_data['AmtExt'].sum()
-    total_investment_formatted = format_large_numbers(total_investment)
-    total_investment_this_year = filtered_data[filtered_data['Year'] == pd.Timestamp.now().year]['AmtExt'].sum()
-    total_investment_this_year_formatted = format_large_numbers(total_investment_this_year)
-    total_investment_this_month = filtered_data[
-        (filtered_data['Year'] == pd.Timestamp.now().year) & 
-        (filtered_data['Month'] == pd.Timestamp.now().month)
-    ]['AmtExt'].sum()
-    total_investment_this_month_formatted = format_large_numbers(total_investment_this_month)
-
-    col1, col2, col3 = st.columns(3)
-    col1.metric("Total Investment", total_investment_formatted)
-    col2.metric("Total Investment This Year", total_investment_this_year_formatted)
-    col3.metric("Total Investment This Month", total_investment_this_month_formatted)
-
-    # Create a bar chart with formatted values
-    bar_chart = px.bar(
-        summary, 
-        x='Investment Type', 
-        y='AmtExt', 
-        text='Formatted AmtExt',
-        title='Investment Type Summary'
-    )
-    bar_chart.update_traces(textposition='outside')
-
-    # Display the bar chart
-    st.plotly_chart(bar_chart)
-
-    # Create a pie chart
-    pie_chart = px.pie(
-        summary, 
-        values='AmtExt', 
-        names='Investment Type', 
-        title='Total Investment by Type'
-    )
-
-    # Display the pie chart
-    st.plotly_chart(pie_chart)
+    if tab4.open:
+        st.header("Visualizations")
+
+        # Add cards for key metrics
+        total_investment = filtered_data['AmtExt'].sum()
+        total_investment_formatted = format_large_numbers(total_investment)
+        total_investment_this_year = filtered_data[filtered_data['Year'] == pd.Timestamp.now().year]['AmtExt'].sum()
+        total_investment_this_year_formatted = format_large_numbers(total_investment_this_year)
+        total_investment_this_month = filtered_data[
+            (filtered_data['Year'] == pd.Timestamp.now().year) & 
+            (filtered_data['Month'] == pd.Timestamp.now().month)
+        ]['AmtExt'].sum()
+        total_investment_this_month_formatted = format_large_numbers(total_investment_this_month)
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Total Investment", total_investment_formatted)
+        col2.metric("Total Investment This Year", total_investment_this_year_formatted)
+        col3.metric("Total Investment This Month", total_investment_this_month_formatted)
+
+        # Create a bar chart with formatted values
+        bar_chart = px.bar(
+            summary, 
+            x='Investment Type', 
+            y='AmtExt', 
+            text='Formatted AmtExt',
+            title='Investment Type Summary'
+        )
+        bar_chart.update_traces(textposition='outside')
+
+        # Display the bar chart
+        st.plotly_chart(bar_chart)
+
+        # Create a pie chart
+        pie_chart = px.pie(
+            summary, 
+            values='AmtExt', 
+            names='Investment Type', 
+            title='Total Investment by Type'
+        )
+
+        # Display the pie chart
+        st.plotly_chart(pie_chart)
 
 # For storing reports
 if 'reports' not in st.session_state:
     st.session_state['reports'] = []
 
 with tab5:
-    st.header("Build Report")
-
-    # Create a new report section
-    if st.button("Create New Report"):
-        st.session_state['reports'].append({"charts": []})
-        st.experimental_rerun()
-
-    # Display existing reports
-    for i, report in enumerate(st.session_state['reports']):
-        st.subheader(f"Report {i + 1}")
-
-        # Allow user to select chart type
-        chart_type = st.selectbox(
-            f"Select Chart Type for Report {i + 1}",
-            options=["Bar Chart", "Line Chart", "Scatter Plot", "Pie Chart"],
-            key=f"chart_type_{i}"
+    if tab5.open:
+        st.header("Build Report")
+
+        # Pull every ledger column instead of just the ones the reports already use
+        st.checkbox("Load all ledger columns", key='all_ledger_columns')
+        st.caption(ledger.aggregates.describe())
+
+        # Create a new report section
+        if st.button("Create New Report"):
+            st.session_state['reports'].append(new_report())
+            st.rerun()
+
+        # Save the report definitions, or replace the current reports with the saved ones
+        save_column, load_column = st.columns(2)
+        save_column.button("Save Reports", on_click=save_report_state, args=(REPORTS_PATH, st.session_state))
+        load_column.button(
+            "Load Saved Reports", on_click=load_report_state,
+            args=(REPORTS_PATH, st.session_state, ["Bar Chart", "Line Chart", "Scatter Plot", "Pie Chart"])
         )
+        if 'reports_message' in st.session_state:
+            status, message = st.session_state.pop('reports_message')
+            if status == "success":
+                st.success(message)
+            else:
+                st.error(message)
 
-        # Allow users to select x and y axis
-        x_axis = st.selectbox(f"Select X-Axis for Report {i + 1}", options=filtered_data.columns, key=f"x_axis_{i}")
-        y_axis = st.selectbox(f"Select Y-Axis for Report {i + 1}", options=filtered_data.columns, key=f"y_axis_{i}")
+        # Plan every expanded report on the page together, so reports sharing an x-axis are aggregated in one pass
+        open_reports = [i for i in range(len(st.session_state['reports'])) if report_is_open(st.session_state, i)]
+        ledger.aggregates.prefetch(filtered_data, planned_aggregations(st.session_state, open_reports), filter_fingerprint)
 
-        # Allow users to select aggregation operator
-        operator = st.selectbox(
-            f"Select Aggregation Operator for Report {i + 1}",
-            options=["SUM", "COUNT", "AVERAGE", "MIN", "MAX"],
-            key=f"operator_{i}"
-        )
+        # Display existing reports; collapsed reports are neither aggregated nor drawn
+        for i, report in enumerate(st.session_state['reports']):
+            report_container = st.expander(
+                f"Report {i + 1}", expanded=report_is_open(st.session_state, i),
+                key=f"report_open_{i}", on_change="rerun"
+            )
+            if not report_container.open:
+                continue
+
+            with report_container:
+                # Allow user to select chart type
+                chart_type = st.selectbox(
+                    f"Select Chart Type for Report {i + 1}",
+                    options=["Bar Chart", "Line Chart", "Scatter Plot", "Pie Chart"],
+                    key=f"chart_type_{i}"
+                )
 
-        # Data labels option
-        show_data_labels = st.checkbox(f"Show Data Labels for Report {i + 1}", value=True, key=f"show_data_labels_{i}")
-        label_format = st.selectbox(
-            f"Select Data Label Format for Report {i + 1}", 
-            options=["Actual Values", "Formatted Values"],
-            key=f"label_format_{i}"
-        )
+                # Allow users to select x and y axis
+                x_axis = st.selectbox(f"Select X-Axis for Report {i + 1}", options=filtered_data.columns, key=f"x_axis_{i}")
+                y_axis = st.selectbox(f"Select Y-Axis for Report {i + 1}", options=filtered_data.columns, key=f"y_axis_{i}")
 
-        # Perform aggregation based on operator
-        if operator == "SUM":
-            y_data = filtered_data.groupby(x_axis, as_index=False)[y_axis].sum()
-        elif operator == "COUNT":
-            y_data = filtered_data.groupby(x_axis, as_index=False)[y_axis].count()
-        elif operator == "AVERAGE":
-            y_data = filtered_data.groupby(x_axis, as_index=False)[y_axis].mean()
-        elif operator == "MIN":
-            y_data = filtered_data.groupby(x_axis, as_index=False)[y_axis].min()
-        elif operator == "MAX":
-            y_data = filtered_data.groupby(x_axis, as_index=False)[y_axis].max()
-
-        # Create data labels
-        if show_data_labels:
-            if label_format == "Actual Values":
-                y_data['Data Labels'] = y_data[y_axis].apply(lambda x: f'{x:,.0f}' if isinstance(x, (int, float)) else x)
-            else:
-                y_data['Data Labels'] = y_data[y_axis].apply(lambda x: format_large_numbers(x) if isinstance(x, (int, float)) else x)
-
-        # Create the selected chart
-        if chart_type == "Bar Chart":
-            chart = px.bar(y_data, x=x_axis, y=y_axis, title=f'{chart_type} of {y_axis} ({operator}) vs {x_axis}')
-            if show_data_labels:
-                chart.update_traces(text=y_data['Data Labels'], textposition='outside')
-        elif chart_type == "Line Chart":
-            chart = px.line(y_data, x=x_axis, y=y_axis, title=f'{chart_type} of {y_axis} ({operator}) vs {x_axis}')
-            if show_data_labels:
-                chart.update_traces(text=y_data['Data Labels'], textposition='top center')
-        elif chart_type == "Scatter Plot":
-            chart = px.scatter(y_data, x=x_axis, y=y_axis, title=f'{chart_type} of {y_axis} ({operator}) vs {x_axis}')
-            if show_data_labels:
-                chart.update_traces(text=y_data['Data Labels'], textposition='top center')
-        elif chart_type == "Pie Chart":
-            chart = px.pie(y_data, values=y_axis, names=x_axis, title=f'{chart_type} of {x_axis} ({operator})')
-            if show_data_labels:
-                chart.update_traces(text=y_data['Data Labels'], textposition='inside')
-
-        # Store the chart in the report
-        st.session_state['reports'][i]['charts'].append(chart)
-
-        # Display the chart
-        st.plotly_chart(chart)
-
-    if st.button("Add New Report"):
-        st.session_state['reports'].append({"charts": []})
-        st.experimental_rerun()
-
-# Close the database connection
-cursor.close()
-connection.close()
\ No newline at end of file
+                # Allow users to select aggregation operator
+                operator = st.selectbox(
+                    f"Select Aggregation Operator for Report {i + 1}",
+                    options=["SUM", "COUNT", "AVERAGE", "MIN", "MAX"],
+                    key=f"operator_{i}"
+                )
+
+                # Data labels option, on by default (set through session state so saved reports can restore it)
+                st.session_state.setdefault(f"show_data_labels_{i}", True)
+                show_data_labels = st.checkbox(f"Show Data Labels for Report {i + 1}", key=f"show_data_labels_{i}")
+                label_format = st.selectbox(
+                    f"Select Data Label Format for Report {i + 1}", 
+                    options=["Actual Values", "Formatted Values"],
+                    key=f"label_format_{i}"
+                )
+
+                # Reuse this report's figure unless its spec or the data changed
+                chart_key = (chart_type, x_axis, y_axis, operator, show_data_labels, label_format, data_version)
+                chart = report['charts'].get(chart_key, lambda: build_report_chart(
+                    ledger.aggregates.aggregate(filtered_data, x_axis, y_axis, operator, filter_fingerprint),
+                    chart_type, x_axis, y_axis, operator, show_data_labels, label_format
+                ))
+
+                # Display the chart
+                st.plotly_chart(chart, key=f"chart_{i}")
+
+        if st.button("Add New Report"):
+            st.session_state['reports'].append(new_report())
+            st.rerun()
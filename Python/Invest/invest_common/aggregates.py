@@ -0,0 +1,136 @@
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# Build Report operators and the pandas reductions behind them
+OPERATOR_FUNCTIONS = {"SUM": "sum", "COUNT": "count", "AVERAGE": "mean", "MIN": "min", "MAX": "max"}
+
+
+def planned_aggregations(session_state, report_numbers):
+    """(x-axis, y-axis, operator) of the chart reports in ``report_numbers`` whose widgets already have values."""
+    planned = []
+    for i in report_numbers:
+        if session_state.get(f"chart_type_{i}") == "Card":
+            continue
+        spec = tuple(session_state.get(f"{name}_{i}") for name in ("x_axis", "y_axis", "operator"))
+        if None not in spec:
+            planned.append(spec)
+    return planned
+
+
+def operator_values(column, operator):
+    """``column`` ready for ``operator``: MIN/MAX of compacted text compare the text itself.
+
+    ``optimize_dtypes`` makes low-cardinality text an unordered
+    categorical, which pandas refuses to take a min or max of.
+    """
+    if operator in ("MIN", "MAX") and isinstance(column.dtype, pd.CategoricalDtype) and not column.cat.ordered:
+        return column.astype(column.cat.categories.dtype)
+    return column
+
+
+def aggregate_report_data(data, x_axis, y_axis, operator):
+    """Group ``data`` by ``x_axis`` and reduce ``y_axis`` with a Build Report operator."""
+    if operator not in OPERATOR_FUNCTIONS:
+        raise ValueError(f"Unknown aggregation operator: {operator}")
+    column = data[y_axis]
+    values = operator_values(column, operator)
+    if values is not column:
+        data = data.assign(**{y_axis: values})
+    return data.groupby(x_axis, as_index=False)[y_axis].agg(OPERATOR_FUNCTIONS[operator])
+
+
+def aggregate_many(data, x_axis, measures):
+    """``{(y_axis, operator): frame}`` for every measure, from one groupby over ``x_axis``.
+
+    Each frame matches ``aggregate_report_data(data, x_axis, y_axis, operator)``.
+    """
+    results = {}
+    named = {}
+    for y_axis, operator in dict.fromkeys(measures):
+        if y_axis == x_axis:
+            # The grouping column can't also be aggregated in the same pass
+            results[(y_axis, operator)] = aggregate_report_data(data, x_axis, y_axis, operator)
+        elif operator not in OPERATOR_FUNCTIONS:
+            raise ValueError(f"Unknown aggregation operator: {operator}")
+        else:
+            named[(y_axis, operator)] = (y_axis, OPERATOR_FUNCTIONS[operator])
+    if named:
+        # Text measures taken a MIN/MAX of are compared as text, as aggregate_report_data does
+        converted = {}
+        for y_axis, operator in named:
+            column = data[y_axis]
+            values = operator_values(column, operator)
+            if values is not column:
+                converted[y_axis] = values
+        if converted:
+            data = data.assign(**converted)
+        outputs = {f"_{j}": spec for j, spec in enumerate(named.values())}
+        combined = data.groupby(x_axis, as_index=False).agg(**outputs)
+        for output, (y_axis, operator) in zip(outputs, named):
+            results[(y_axis, operator)] = combined[[x_axis, output]].rename(columns={output: y_axis})
+    return results
+
+
+class AggregationCache:
+    """Memoised Build Report aggregations for one ledger load.
+
+    Results are keyed on (x-axis, y-axis, operator, filter fingerprint),
+    where the fingerprint identifies the sidebar mask the data was cut
+    with, so reports and sessions asking for the same aggregation share
+    it. Only the ``max_size`` most recently used results are kept;
+    ``hits`` and ``misses`` count lookups.
+    """
+
+    def __init__(self, max_size=32):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._results = OrderedDict()
+
+    def __len__(self):
+        return len(self._results)
+
+    def aggregate(self, data, x_axis, y_axis, operator, filter_fingerprint):
+        key = (x_axis, y_axis, operator, filter_fingerprint)
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                self.hits += 1
+                self._results.move_to_end(key)
+        if result is None:
+            result = aggregate_report_data(data, x_axis, y_axis, operator)
+            with self._lock:
+                self.misses += 1
+                self._results[key] = result
+                while len(self._results) > self.max_size:
+                    self._results.popitem(last=False)
+
+        # Shallow copy so callers can add label columns without touching the cached frame
+        return result.copy(deep=False)
+
+    def prefetch(self, data, planned, filter_fingerprint):
+        """Compute the uncached ``planned`` (x-axis, y-axis, operator) aggregations, one pass per x-axis."""
+        by_x_axis = OrderedDict()
+        with self._lock:
+            for x_axis, y_axis, operator in planned:
+                if (x_axis, y_axis, operator, filter_fingerprint) not in self._results:
+                    by_x_axis.setdefault(x_axis, []).append((y_axis, operator))
+
+        for x_axis, measures in by_x_axis.items():
+            try:
+                results = aggregate_many(data, x_axis, measures)
+            except (TypeError, ValueError):
+                # e.g. SUM of a text column; leave each report to compute (and fail) on its own
+                continue
+            with self._lock:
+                for (y_axis, operator), result in results.items():
+                    self.misses += 1
+                    self._results[(x_axis, y_axis, operator, filter_fingerprint)] = result
+                while len(self._results) > self.max_size:
+                    self._results.popitem(last=False)
+
+    def describe(self):
+        return f"Aggregations: {self.hits} reused, {self.misses} computed"
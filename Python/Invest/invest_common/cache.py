@@ -0,0 +1,87 @@
+import hashlib
+import json
+import os
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# Bump when the layout of the cached frames changes so old files are ignored
+CACHE_FORMAT_VERSION = 2
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".ledger_cache"
+)
+
+
+def cache_key(*parts):
+    """Stable short hash of the JSON-serialisable ``parts`` plus the format version."""
+    payload = json.dumps([CACHE_FORMAT_VERSION, *parts], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class LedgerCache:
+    """Versioned Feather files for the ledger frames, one file per name and key.
+
+    Files are written uncompressed so they can be memory-mapped on load,
+    and carry their key, ``high_water_mark`` and ``memory_report`` in the
+    Arrow metadata.
+    Only the ``max_files`` most recently used files are kept on disk. No
+    frames are kept in memory: whoever loads one holds on to it.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_files=8):
+        self.directory = directory
+        self.max_files = max_files
+
+    def path_for(self, name, key):
+        return os.path.join(self.directory, f"{name}-{key}.feather")
+
+    def load(self, name, key):
+        """Return ``(frame, high_water_mark, memory_report)`` or ``None`` when nothing matches ``key``."""
+        path = self.path_for(name, key)
+        if not os.path.exists(path):
+            return None
+        table = feather.read_table(path, memory_map=True)
+        metadata = table.schema.metadata or {}
+        if metadata.get(b"ledger_cache_key", b"").decode() != key:
+            return None
+        high_water_mark = json.loads(metadata.get(b"high_water_mark", b"null"))
+        memory_report = json.loads(metadata.get(b"memory_report", b"null"))
+        if memory_report is not None:
+            memory_report = pd.DataFrame(memory_report)
+        df = table.to_pandas()
+
+        # Mark the file as recently used so pruning keeps it
+        os.utime(path)
+        return df, high_water_mark, memory_report
+
+    def save(self, name, key, df, high_water_mark, memory_report=None):
+        os.makedirs(self.directory, exist_ok=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            b"ledger_cache_key": key.encode(),
+            b"high_water_mark": json.dumps(high_water_mark).encode(),
+            b"memory_report": json.dumps(
+                None if memory_report is None else memory_report.to_dict(), default=float
+            ).encode(),
+        })
+
+        # Write to a temporary file first so readers never see a partial file
+        path = self.path_for(name, key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        feather.write_feather(table, tmp_path, compression="uncompressed")
+        os.replace(tmp_path, path)
+        self._prune()
+
+    def _prune(self):
+        # Drop the least recently used files beyond max_files
+        paths = [
+            os.path.join(self.directory, filename)
+            for filename in os.listdir(self.directory) if filename.endswith(".feather")
+        ]
+        paths.sort(key=os.path.getmtime, reverse=True)
+        for path in paths[self.max_files:]:
+            os.remove(path)
@@ -0,0 +1,238 @@
+import os
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+
+from .cache import DEFAULT_CACHE_DIR, LedgerCache, cache_key
+from .db import get_connection_pool
+from .dtypes import concat_rows, optimize_dtypes
+from .ledger import GL_ENTRY_EXT_TABLE, GL_ENTRY_TABLE, read_sql_chunks
+
+FIXED_ASSET_TABLE = "[UON PEN RBS$Fixed Asset$7d966dd5-a317-4db2-b529-926bbce15abf]"
+
+# Database tables Data Modeling can join, by the name shown in the app
+CATALOG_TABLES = {
+    "G/L Entry": GL_ENTRY_TABLE,
+    "G/L Entry Extension": GL_ENTRY_EXT_TABLE,
+    "Fixed Asset": FIXED_ASSET_TABLE,
+}
+
+# Estimated sizes above which loading a catalog table is warned about, or refused
+TABLE_WARN_BYTES = 64 * 1024 ** 2
+MAX_TABLE_BYTES = 512 * 1024 ** 2
+
+# Bytes a value of a number or date column takes; text takes its declared size plus a string's overhead
+_FIXED_WIDTH_TYPES = {"int", "float", "Decimal", "bool", "datetime", "date", "time"}
+_FIXED_WIDTH_BYTES = 8
+_TEXT_OVERHEAD_BYTES = 50
+# Declared size assumed for text columns the driver doesn't size
+_TEXT_DEFAULT_SIZE = 20
+
+# Table row counts from the storage statistics, so nothing is scanned to count rows
+_ROW_COUNT_SQL = """
+    SELECT SUM(row_count) FROM sys.dm_db_partition_stats
+    WHERE object_id = OBJECT_ID(?) AND index_id IN (0, 1)
+    """
+
+
+class TableInfo:
+    """Schema and row count of one catalog table, read without fetching its rows.
+
+    ``row_bytes`` is the estimated in-memory size of one row before it is
+    compacted, so ``estimated_bytes`` is an upper bound on a load.
+    """
+
+    def __init__(self, name, table, columns, types, rows, row_bytes):
+        self.name = name
+        self.table = table
+        self.columns = columns
+        self.types = types
+        self.rows = rows
+        self.row_bytes = row_bytes
+
+    @property
+    def estimated_bytes(self):
+        return self.rows * self.row_bytes
+
+
+def _type_name(type_code):
+    # pyodbc describes columns with Python types; other drivers may not describe them at all
+    return getattr(type_code, "__name__", "") if type_code is not None else ""
+
+
+def _column_bytes(column):
+    # From a cursor description entry: (name, type_code, display_size, internal_size, ...)
+    if _type_name(column[1]) in _FIXED_WIDTH_TYPES:
+        return _FIXED_WIDTH_BYTES
+    size = column[3] if len(column) > 3 else None
+    # Unsized and MAX columns are described with no size, 0 or -1
+    if not size or size < 0:
+        size = _TEXT_DEFAULT_SIZE
+    return _TEXT_OVERHEAD_BYTES + size
+
+
+def read_table_info(connection, name, table):
+    """``TableInfo`` for ``table`` from an empty select's cursor description and the row statistics."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"SELECT * FROM {table} WHERE 1 = 0")
+        columns = [column[0] for column in cursor.description]
+        types = [_type_name(column[1]) for column in cursor.description]
+        row_bytes = sum(_column_bytes(column) for column in cursor.description)
+        cursor.fetchall()
+
+        rows = None
+        try:
+            cursor.execute(_ROW_COUNT_SQL, (table,))
+            rows = cursor.fetchone()[0]
+        except Exception:
+            # The statistics view needs VIEW DATABASE STATE; count the rows instead
+            pass
+        if rows is None:
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            rows = cursor.fetchone()[0]
+    finally:
+        cursor.close()
+    return TableInfo(name, table, columns, types, int(rows), row_bytes)
+
+
+def check_table_budget(info, warn_bytes=TABLE_WARN_BYTES, max_bytes=MAX_TABLE_BYTES):
+    """``(status, message)`` for loading a catalog table: "success", "warning", or "error" when it is refused."""
+    size = f"{info.rows:,} rows, up to {info.estimated_bytes / 1024 ** 2:,.1f} MB"
+    if info.estimated_bytes > max_bytes:
+        return "error", f"Load of {info.name} refused: {size} is over the {max_bytes / 1024 ** 2:,.0f} MB limit."
+    if info.estimated_bytes > warn_bytes:
+        return "warning", f"Large table: {info.name} is {size}."
+    return "success", f"{info.name}: {size}"
+
+
+class TableCatalog:
+    """The database tables Data Modeling can join, loaded only when a relationship uses them.
+
+    Schemas and row counts are read for every table in ``tables`` and
+    kept for ``metadata_ttl`` seconds; no rows are fetched for them.
+    ``load`` pulls a whole table ``chunk_size`` rows at a time, compacts
+    it and keeps it in ``cache`` as a Feather file keyed by its row
+    count, so it is pulled again only once rows are added or removed.
+    A table whose estimated size is over ``max_bytes`` is refused
+    before anything is fetched (see ``check_table_budget``).
+    Only loads of the same table wait for each other; the schemas and
+    row counts stay available while a table is being pulled or the
+    schemas are read again. A table whose schema can't be read is left
+    out and its error kept in ``errors``.
+    """
+
+    def __init__(self, pool, cache=None, tables=CATALOG_TABLES, metadata_ttl=300, chunk_size=50_000,
+                 max_bytes=MAX_TABLE_BYTES, clock=time.monotonic):
+        self.pool = pool
+        self.cache = cache if cache is not None else LedgerCache(os.path.join(DEFAULT_CACHE_DIR, "tables"))
+        self.tables = dict(tables)
+        self.metadata_ttl = metadata_ttl
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.errors = {}
+        self._lock = threading.Lock()
+        # Held by the one thread reading the schemas again, without holding up readers of the old ones
+        self._refresh_lock = threading.Lock()
+        # One lock per table, so a table is pulled once at a time without holding up the others
+        self._load_locks = {name: threading.Lock() for name in self.tables}
+        self._info = {}
+        self._read_at = None
+        # The frame last loaded per table, with the cache key it was loaded for
+        self._frames = {}
+
+    def _stale(self):
+        return self._read_at is None or self.clock() - self._read_at >= self.metadata_ttl
+
+    def _refresh_info(self):
+        info, errors = {}, {}
+        with self.pool.connection() as connection:
+            for name, table in self.tables.items():
+                try:
+                    info[name] = read_table_info(connection, name, table)
+                except Exception as error:
+                    errors[name] = str(error)
+        with self._lock:
+            self._info, self.errors = info, errors
+            self._read_at = self.clock()
+
+    def info(self):
+        """``TableInfo`` per available table, read again once it is ``metadata_ttl`` seconds old.
+
+        While one thread reads the schemas again the others get the
+        previous ones; only the first read is waited for.
+        """
+        with self._lock:
+            first_read = self._read_at is None
+            if not self._stale():
+                return self._info
+        if self._refresh_lock.acquire(blocking=first_read):
+            try:
+                with self._lock:
+                    stale = self._stale()
+                if stale:
+                    self._refresh_info()
+            finally:
+                self._refresh_lock.release()
+        with self._lock:
+            return self._info
+
+    def names(self):
+        return list(self.info())
+
+    def columns(self, name):
+        return self.info()[name].columns
+
+    def overview(self):
+        """One row per available table with its row and column counts and estimated size."""
+        return pd.DataFrame(
+            [
+                {"Table": name, "Rows": info.rows, "Columns": len(info.columns),
+                 "Estimated MB": round(info.estimated_bytes / 1024 ** 2, 1)}
+                for name, info in self.info().items()
+            ],
+            columns=["Table", "Rows", "Columns", "Estimated MB"]
+        )
+
+    def _fetch(self, connection, info):
+        chunks = []
+        for chunk in read_sql_chunks(connection, f"SELECT * FROM {info.table}", chunk_size=self.chunk_size):
+            chunk, _ = optimize_dtypes(chunk)
+            chunks.append(chunk)
+        return concat_rows(chunks)
+
+    def load(self, name):
+        """The rows of catalog table ``name``, from the cache when its row count hasn't changed.
+
+        Repeated loads return the same frame, so indexes built on it can
+        be reused. Raises ``ValueError`` when the table is over the size
+        budget; a cached copy is still returned.
+        """
+        info = self.info()[name]
+        key = cache_key(info.table, info.columns, info.rows)
+        with self._load_locks[name]:
+            held = self._frames.get(name)
+            if held is not None and held[0] == key:
+                return held[1]
+            cached = self.cache.load("table", key)
+            if cached is not None:
+                df = cached[0]
+            else:
+                status, message = check_table_budget(info, max_bytes=self.max_bytes)
+                if status == "error":
+                    raise ValueError(message)
+                with self.pool.connection() as connection:
+                    df = self._fetch(connection, info)
+                self.cache.save("table", key, df, None)
+            with self._lock:
+                self._frames[name] = (key, df)
+            return df
+
+
+@st.cache_resource
+def get_table_catalog():
+    """The ``TableCatalog`` of the UON database for this Streamlit process."""
+    return TableCatalog(get_connection_pool())
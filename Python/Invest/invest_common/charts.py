@@ -0,0 +1,123 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.io as pio
+
+from .downsample import reduce_chart_data
+from .formatting import format_number_labels
+
+# Line and scatter charts with more points than this switch to WebGL traces
+WEBGL_THRESHOLD = 1_000
+
+# Largest serialised figure sent to the browser; bigger charts are drawn with fewer points
+MAX_PAYLOAD_BYTES = 1_500_000
+
+# Never shrink a chart below this many points to meet the payload budget
+_MIN_BUDGET_POINTS = 100
+
+
+def figure_payload_size(chart):
+    """Bytes of JSON the figure is sent to the browser as."""
+    return len(pio.to_json(chart, validate=False))
+
+
+def _draw_webgl_chart(y_data, chart_type, x_axis, y_axis, title):
+    # Plotly writes int64 arrays and dates one JSON value per point, so send
+    # integers as int32 (or float64 when too large) and dates as float64
+    # epoch milliseconds; those are binary-encoded
+    dates = pd.api.types.is_datetime64_any_dtype(y_data[x_axis].dtype)
+    if dates:
+        y_data = y_data.assign(**{x_axis: y_data[x_axis].astype('datetime64[ms]').astype('int64').astype('float64')})
+    compact = {}
+    for name in dict.fromkeys((x_axis, y_axis)):
+        column = y_data[name]
+        if pd.api.types.is_integer_dtype(column.dtype) and not column.isna().any():
+            fits = column.between(np.iinfo(np.int32).min, np.iinfo(np.int32).max).all()
+            compact[name] = column.astype('int32' if fits else 'float64')
+    if compact:
+        y_data = y_data.assign(**compact)
+    plot = px.line if chart_type == "Line Chart" else px.scatter
+    chart = plot(y_data, x=x_axis, y=y_axis, title=title, render_mode='webgl')
+    if dates:
+        chart.update_xaxes(type='date')
+    return chart
+
+
+def _draw_report_chart(y_data, chart_type, x_axis, y_axis, operator, show_data_labels, label_format):
+    if chart_type in ("Line Chart", "Scatter Plot") and len(y_data) > WEBGL_THRESHOLD:
+        # Labels on thousands of points are unreadable and would dominate the payload
+        return _draw_webgl_chart(y_data, chart_type, x_axis, y_axis, f'{chart_type} of {y_axis} ({operator}) vs {x_axis}')
+
+    # Create data labels on a copy; y_data may be an aggregation shared with other sessions
+    if show_data_labels:
+        y_data = y_data.assign(**{'Data Labels': format_number_labels(y_data[y_axis], label_format)})
+
+    # Create the selected chart
+    if chart_type == "Bar Chart":
+        chart = px.bar(y_data, x=x_axis, y=y_axis, title=f'{chart_type} of {y_axis} ({operator}) vs {x_axis}')
+        if show_data_labels:
+            chart.update_traces(text=y_data['Data Labels'], textposition='outside')
+    elif chart_type == "Line Chart":
+        chart = px.line(y_data, x=x_axis, y=y_axis, title=f'{chart_type} of {y_axis} ({operator}) vs {x_axis}')
+        if show_data_labels:
+            chart.update_traces(text=y_data['Data Labels'], textposition='top center')
+    elif chart_type == "Scatter Plot":
+        chart = px.scatter(y_data, x=x_axis, y=y_axis, title=f'{chart_type} of {y_axis} ({operator}) vs {x_axis}')
+        if show_data_labels:
+            chart.update_traces(text=y_data['Data Labels'], textposition='top center')
+    elif chart_type == "Pie Chart":
+        chart = px.pie(y_data, values=y_axis, names=x_axis, title=f'{chart_type} of {x_axis} ({operator})')
+        if show_data_labels:
+            chart.update_traces(text=y_data['Data Labels'], textposition='inside')
+    return chart
+
+
+def build_report_chart(y_data, chart_type, x_axis, y_axis, operator, show_data_labels, label_format,
+                       max_points=None, payload_budget=MAX_PAYLOAD_BYTES):
+    """Plot the aggregated ``y_data`` (see ``aggregate_report_data``) as ``chart_type``.
+
+    High-cardinality x-axes are reduced to ``max_points`` first (see
+    ``reduce_chart_data``), large line and scatter charts use WebGL
+    traces without data labels, and a figure whose serialised size is
+    over ``payload_budget`` bytes is redrawn with half the points. The
+    title says when any of this happened.
+    """
+    while True:
+        reduced, reduction = reduce_chart_data(y_data, chart_type, x_axis, y_axis, operator, max_points)
+        chart = _draw_report_chart(reduced, chart_type, x_axis, y_axis, operator, show_data_labels, label_format)
+        if len(reduced) <= _MIN_BUDGET_POINTS or figure_payload_size(chart) <= payload_budget:
+            break
+        max_points = max(len(reduced) // 2, _MIN_BUDGET_POINTS)
+
+    if reduction is not None:
+        chart.update_layout(title_text=f"{chart.layout.title.text}<br><sup>{reduction}</sup>")
+    return chart
+
+
+class ChartCache:
+    """The most recently used figures of one Build Report, keyed on their spec.
+
+    A key holds everything the figure depends on (chart type, axes,
+    operator, label options and the data version), so a figure is only
+    rebuilt when one of them changes. At most ``max_size`` are kept.
+    """
+
+    def __init__(self, max_size=4):
+        self.max_size = max_size
+        self._charts = OrderedDict()
+
+    def __len__(self):
+        return len(self._charts)
+
+    def get(self, key, build):
+        """The figure for ``key``, calling ``build()`` to make it on a miss."""
+        chart = self._charts.get(key)
+        if chart is None:
+            chart = build()
+            self._charts[key] = chart
+        self._charts.move_to_end(key)
+        while len(self._charts) > self.max_size:
+            self._charts.popitem(last=False)
+        return chart
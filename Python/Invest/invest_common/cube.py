@@ -0,0 +1,68 @@
+import numpy as np
+
+from .rollups import ROLLUP_GRAINS
+
+# How each cell statistic combines when cells are rolled up
+_ROLLUP_STATS = {'sum': 'sum', 'count': 'sum', 'min': 'min', 'max': 'max'}
+
+
+class LedgerCube:
+    """AmtExt sum/count/min/max per Investment Type, Year, Quarter and Month.
+
+    Built once per data load. Sidebar filters and the summary tables are
+    answered by masking and regrouping these few hundred cells instead of
+    rescanning the ledger rows. Entries without a posting date keep a cell
+    with a missing Year/Month, so the per-type totals still include them.
+    """
+
+    def __init__(self, G_LEntry_filtered):
+        # Quarter follows from Year and Month, so grouping on it adds no cells
+        cells = (
+            G_LEntry_filtered
+            .groupby(['Investment Type', 'Year', 'Quarter', 'Month'], dropna=False, observed=True)['AmtExt']
+            .agg(list(_ROLLUP_STATS))
+            .reset_index()
+        )
+        self.cells = cells
+
+        self._types = cells['Investment Type'].to_numpy()
+        self._years = cells['Year'].to_numpy(dtype=float)
+        self._months = cells['Month'].to_numpy(dtype=float)
+        self._quarters = cells['Quarter'].astype(str).to_numpy()
+
+    def select(self, investment_type='All', year='All', month='All', quarter='All'):
+        """Cells matching the sidebar selections."""
+        mask = np.ones(len(self.cells), dtype=bool)
+        if investment_type != 'All':
+            mask &= self._types == investment_type
+        if year != 'All':
+            mask &= self._years == int(year)
+        if month != 'All':
+            mask &= self._months == int(month)
+        if quarter != 'All':
+            mask &= self._quarters == quarter
+        return self.cells[mask]
+
+    def rollup(self, grain, stat='sum', **filters):
+        """Summary table for ``grain`` (see ``ROLLUP_GRAINS``) shaped like the pandas groupby."""
+        parts = ROLLUP_GRAINS[grain]
+        cells = self.select(**filters)
+        if parts:
+            cells = cells.dropna(subset=['Year']).astype({'Year': int, 'Month': int})
+
+        keys = parts + ['Investment Type']
+        if stat == 'mean':
+            rolled = cells.groupby(keys, as_index=False)[['sum', 'count']].sum()
+            rolled['AmtExt'] = rolled['sum'] / rolled['count']
+        else:
+            rolled = cells.groupby(keys, as_index=False)[stat].agg(_ROLLUP_STATS[stat])
+            rolled = rolled.rename(columns={stat: 'AmtExt'})
+        return rolled[keys + ['AmtExt']]
+
+    def total(self, stat='sum', **filters):
+        """Single AmtExt statistic over the cells matching ``filters``."""
+        cells = self.select(**filters)
+        if stat == 'mean':
+            return cells['sum'].sum() / cells['count'].sum()
+        return cells[stat].agg(_ROLLUP_STATS[stat])
+
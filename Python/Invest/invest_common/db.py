@@ -0,0 +1,108 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import streamlit as st
+
+# Define the connection string
+CONNECTION_STR = (
+    "Driver={ODBC Driver 17 for SQL Server};"
+    "Server=AGILEDB\\DEV2019;"
+    "Database=UON;"
+    "Uid=erp;"
+    "Pwd=Pass@7046.;"
+)
+
+
+class ConnectionPool:
+    """Bounded pool of database connections shared by the Invest apps.
+
+    ``connect`` creates a new DB-API connection (``pyodbc.connect`` in the
+    apps, ``sqlite3.connect`` against a local stand-in). Idle connections
+    are health-checked before reuse once they have sat for
+    ``health_check_interval`` seconds, and a connection that fails its
+    check or raises while checked out is closed and replaced.
+    """
+
+    def __init__(self, connect, max_size=4, timeout=30, health_check_interval=30,
+                 health_check_sql="SELECT 1", clock=time.monotonic):
+        self._connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.health_check_sql = health_check_sql
+        self._clock = clock
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._idle = queue.LifoQueue()
+
+    def _is_healthy(self, connection):
+        try:
+            cursor = connection.cursor()
+            cursor.execute(self.health_check_sql)
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No database connection free after {self.timeout}s (pool size {self.max_size})")
+        try:
+            while True:
+                try:
+                    connection, idle_since = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                if self._clock() - idle_since < self.health_check_interval or self._is_healthy(connection):
+                    return connection
+                self._close(connection)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection, discard=False):
+        if discard:
+            self._close(connection)
+        else:
+            self._idle.put((connection, self._clock()))
+        self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Check a connection out for the ``with`` block; it is discarded if the block raises."""
+        connection = self.acquire()
+        try:
+            yield connection
+        except BaseException:
+            self.release(connection, discard=True)
+            raise
+        self.release(connection)
+
+    def close(self):
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(connection)
+
+
+def connect_uon():
+    # Imported here so the pool itself works without the ODBC driver installed
+    import pyodbc as pyod
+    return pyod.connect(CONNECTION_STR)
+
+
+@st.cache_resource
+def get_connection_pool():
+    """The ``ConnectionPool`` to the UON database for this Streamlit process."""
+    return ConnectionPool(connect_uon)
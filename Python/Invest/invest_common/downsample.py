@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+# Most points (bars, slices, line vertices) a Build Report chart is drawn with
+MAX_CHART_POINTS = 500
+
+# Line and scatter charts are drawn with WebGL, so they can keep far more points
+MAX_WEBGL_POINTS = 20_000
+
+# How the aggregates of merged x values are combined, per Build Report operator
+_COMBINE = {"SUM": "sum", "COUNT": "sum", "AVERAGE": "mean", "MIN": "min", "MAX": "max"}
+
+
+def lttb_indices(x, y, points):
+    """Positions of the ``points`` samples Largest-Triangle-Three-Buckets keeps of a line.
+
+    ``x`` must be sorted. The first and last points are always kept; every
+    bucket in between keeps the point forming the largest triangle with
+    the previously kept point and the average of the next bucket.
+    """
+    rows = len(x)
+    if points >= rows or points < 3:
+        return np.arange(rows)
+
+    x = np.asarray(x, dtype='float64')
+    y = np.nan_to_num(np.asarray(y, dtype='float64'))
+    every = (rows - 2) / (points - 2)
+    kept = np.empty(points, dtype=np.int64)
+    kept[0] = 0
+    previous = 0
+    for bucket in range(points - 2):
+        start = int(bucket * every) + 1
+        end = int((bucket + 1) * every) + 1
+        following = slice(end, min(int((bucket + 2) * every) + 1, rows))
+        average_x = x[following].mean()
+        average_y = y[following].mean()
+        area = np.abs(
+            (x[previous] - average_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (average_y - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        kept[bucket + 1] = previous
+    kept[-1] = rows - 1
+    return kept
+
+
+def _axis_values(column):
+    # Numbers LTTB and binning can work with, or None for text-like axes
+    if pd.api.types.is_datetime64_any_dtype(column.dtype):
+        return column.astype('int64').to_numpy(dtype='float64')
+    if pd.api.types.is_numeric_dtype(column.dtype) and not pd.api.types.is_bool_dtype(column.dtype):
+        return column.to_numpy(dtype='float64', na_value=np.nan)
+    return None
+
+
+def _top_with_other(y_data, x_axis, y_axis, operator, max_points):
+    # Keep the largest values and fold the rest into one "Other" row
+    keep = max_points - 1
+    ranked = y_data[y_axis].abs().to_numpy(dtype='float64', na_value=-np.inf)
+    top = np.sort(np.argsort(-ranked, kind='stable')[:keep])
+    rest = np.setdiff1d(np.arange(len(y_data)), top)
+    other = y_data[y_axis].iloc[rest].agg(_COMBINE[operator])
+    reduced = pd.DataFrame({
+        x_axis: pd.array(list(y_data[x_axis].iloc[top].astype(str)) + ['Other'], dtype=object),
+        y_axis: np.append(y_data[y_axis].iloc[top].to_numpy(dtype='float64', na_value=np.nan), other),
+    })
+    return reduced, f"top {keep:,} of {len(y_data):,} {x_axis} values, the rest as Other"
+
+
+def _binned(y_data, x_axis, y_axis, operator, max_points, values):
+    # Merge neighbouring x values into max_points equal-width bins labelled by their lower edge
+    finite = np.isfinite(values)
+    edges = np.linspace(values[finite].min(), values[finite].max(), max_points + 1)
+    bins = np.clip(np.searchsorted(edges, values[finite], side='right') - 1, 0, max_points - 1)
+    combined = y_data[y_axis][finite].groupby(bins).agg(_COMBINE[operator])
+    lower = edges[combined.index.to_numpy()]
+    if pd.api.types.is_datetime64_any_dtype(y_data[x_axis].dtype):
+        # _axis_values counted dates in the column's own unit
+        unit = y_data[x_axis].dt.unit
+        lower = pd.to_datetime(lower.astype('int64'), unit=unit).as_unit(unit)
+    reduced = pd.DataFrame({x_axis: lower, y_axis: combined.to_numpy()})
+    return reduced, f"{len(y_data):,} {x_axis} values in {max_points:,} bins"
+
+
+def max_points_for(chart_type):
+    if chart_type in ("Line Chart", "Scatter Plot"):
+        return MAX_WEBGL_POINTS
+    return MAX_CHART_POINTS
+
+
+def reduce_chart_data(y_data, chart_type, x_axis, y_axis, operator, max_points=None):
+    """Return ``(y_data, note)`` with at most ``max_points`` rows to draw.
+
+    ``max_points`` defaults to ``max_points_for(chart_type)``.
+
+    Line charts over a numeric or date x-axis are downsampled with LTTB,
+    other numeric or date x-axes are merged into equal-width bins, and
+    text-like x-axes keep their largest values plus an "Other" row.
+    Merged values are combined according to ``operator`` (averages as
+    the mean of the merged averages). ``note`` says what was done, or is
+    ``None`` when ``y_data`` was small enough already.
+    """
+    if max_points is None:
+        max_points = max_points_for(chart_type)
+    if len(y_data) <= max_points:
+        return y_data, None
+    if x_axis == y_axis or not pd.api.types.is_numeric_dtype(y_data[y_axis].dtype):
+        # Nothing to rank or merge text results by; draw the first values only
+        return y_data.head(max_points), f"first {max_points:,} of {len(y_data):,} {x_axis} values"
+
+    values = _axis_values(y_data[x_axis])
+    if values is None or not np.isfinite(values).any():
+        return _top_with_other(y_data, x_axis, y_axis, operator, max_points)
+    if chart_type in ("Line Chart", "Scatter Plot"):
+        ordered = y_data.iloc[np.argsort(values, kind='stable')]
+        kept = lttb_indices(np.sort(values), ordered[y_axis], max_points)
+        return ordered.iloc[kept], f"{max_points:,} of {len(y_data):,} points (LTTB downsampled)"
+    return _binned(y_data, x_axis, y_axis, operator, max_points, values)
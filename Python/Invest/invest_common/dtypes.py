@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+# Text columns with at most this share of distinct values become categoricals
+CATEGORY_RATIO = 0.5
+
+# Small integer types for the derived date parts
+_DATE_PART_DTYPES = {'Year': 'int16', 'Month': 'int8'}
+
+
+def _optimize_column(column, category_ratio):
+    if column.name in _DATE_PART_DTYPES:
+        dtype = _DATE_PART_DTYPES[column.name]
+        # Entries without a posting date leave gaps, which need the nullable type
+        return column.astype(dtype.capitalize() if column.isna().any() else dtype)
+
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column
+
+    if pd.api.types.is_integer_dtype(column.dtype):
+        return pd.to_numeric(column, downcast='integer')
+
+    if pd.api.types.is_object_dtype(column.dtype) or pd.api.types.is_string_dtype(column.dtype):
+        inferred = pd.api.types.infer_dtype(column, skipna=True)
+        # pyodbc returns DECIMAL/MONEY columns as Decimal objects
+        if inferred == 'decimal':
+            return column.astype('float64')
+        if inferred == 'string' and len(column) and column.nunique() <= category_ratio * len(column):
+            return column.astype('category')
+    return column
+
+
+def optimize_dtypes(df, category_ratio=CATEGORY_RATIO):
+    """Return ``(df, report)`` with compact dtypes and the per-column memory saved.
+
+    Low-cardinality text becomes categorical, Decimal objects become floats,
+    integers are downcast and Year/Month become small integers. ``report``
+    has ``before`` and ``after`` byte counts per column.
+    """
+    before = df.memory_usage(index=False, deep=True)
+    optimized = df.assign(**{name: _optimize_column(df[name], category_ratio) for name in df.columns})
+    after = optimized.memory_usage(index=False, deep=True)
+    report = pd.DataFrame({'before': before, 'after': after})
+    return optimized, report
+
+
+def describe_memory_report(report):
+    before = report['before'].sum() / 1024 ** 2
+    after = report['after'].sum() / 1024 ** 2
+    return f"Ledger memory: {before:,.1f} MB → {after:,.1f} MB"
+
+
+def concat_rows(frames):
+    """Concatenate ``frames`` keeping their categorical columns categorical.
+
+    A column categorical in any frame is categorical in the result. Its
+    categories are the values of every frame in first-seen order, whether
+    or not that frame's column was made categorical, so the first frame
+    keeps its codes and only later frames with new values are recoded.
+    """
+    frames = list(frames)
+    categorical = {
+        name for frame in frames for name in frame.columns if isinstance(frame[name].dtype, pd.CategoricalDtype)
+    }
+    categories = {}
+    for frame in frames:
+        for name in categorical.intersection(frame.columns):
+            column = frame[name]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                current = column.cat.categories
+            else:
+                current = pd.Index(column.dropna().unique())
+            seen = categories.get(name)
+            categories[name] = current if seen is None else seen.append(current[~current.isin(seen)])
+
+    aligned = []
+    for frame in frames:
+        recoded = {}
+        for name, union in categories.items():
+            if name not in frame:
+                continue
+            column = frame[name]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                if not column.cat.categories.equals(union):
+                    recoded[name] = column.cat.set_categories(union)
+            else:
+                recoded[name] = pd.Categorical(np.asarray(column, dtype=object), categories=union)
+        aligned.append(frame.assign(**recoded) if recoded else frame)
+    return pd.concat(aligned, ignore_index=True)
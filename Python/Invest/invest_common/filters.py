@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+
+def _code_for(labels, value):
+    # -2 never matches: -1 is already the code for missing values
+    position = labels.get_indexer([value])[0]
+    return position if position >= 0 else -2
+
+
+class LedgerFilter:
+    """Sidebar filtering over integer codes precomputed once per data load.
+
+    All selections are combined into a single boolean mask and applied
+    with one gather, instead of copying the ledger and re-masking it (and
+    stringifying every Quarter) on each rerun.
+    """
+
+    def __init__(self, G_LEntry_filtered):
+        self.rows = len(G_LEntry_filtered)
+        self._type_codes, self._types = pd.factorize(G_LEntry_filtered['Investment Type'])
+        self._years = G_LEntry_filtered['Year'].fillna(-1).to_numpy(dtype=np.int16)
+        self._months = G_LEntry_filtered['Month'].fillna(-1).to_numpy(dtype=np.int8)
+        self._quarter_codes, quarters = pd.factorize(G_LEntry_filtered['Quarter'])
+        self._quarters = pd.Index(quarters.astype(str))
+
+    def mask(self, investment_type='All', year='All', month='All', quarter='All'):
+        mask = np.ones(self.rows, dtype=bool)
+        if investment_type != 'All':
+            mask &= self._type_codes == _code_for(self._types, investment_type)
+        if year != 'All':
+            mask &= self._years == int(year)
+        if month != 'All':
+            mask &= self._months == int(month)
+        if quarter != 'All':
+            mask &= self._quarter_codes == _code_for(self._quarters, quarter)
+        return mask
+
+    def positions(self, **filters):
+        """Row positions matching ``filters``, or ``None`` when nothing is filtered.
+
+        Nothing is memoised: the filter is shared by every session, and
+        masking the precomputed codes is cheaper than keeping results apart.
+        """
+        if all(value == 'All' for value in filters.values()):
+            return None
+        return np.flatnonzero(self.mask(**filters))
+
+    def apply(self, G_LEntry_filtered, **filters):
+        """Rows of ``G_LEntry_filtered`` matching ``filters``; unfiltered frames are not copied."""
+        positions = self.positions(**filters)
+        if positions is None:
+            return G_LEntry_filtered
+        return G_LEntry_filtered.take(positions)
+
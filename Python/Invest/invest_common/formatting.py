@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+# Suffixes for the "Formatted Values" labels, largest first
+_SCALES = [(1_000_000_000, 'B'), (1_000_000, 'M'), (1_000, 'K')]
+
+# Rounded magnitudes from here on don't fit in int64 and are labelled one at a time
+_INT64_LIMIT = 2.0 ** 63
+
+
+def _thousands(whole):
+    # Comma-separated text for non-negative integers, one 3-digit group per pass
+    lead = whole % 1000
+    tail = np.full(whole.shape, '', dtype=str)
+    rest = whole // 1000
+    while (rest > 0).any():
+        more = rest > 0
+        group = np.char.add(',', np.char.zfill(lead.astype(str), 3))
+        tail = np.where(more, np.char.add(group, tail), tail)
+        lead = np.where(more, rest % 1000, lead)
+        rest = rest // 1000
+    return np.char.add(lead.astype(str), tail)
+
+
+def _two_decimals(units):
+    # "12.34" from 1234 hundredths
+    cents = np.char.zfill((units % 100).astype(str), 2)
+    return np.char.add(np.char.add((units // 100).astype(str), '.'), cents)
+
+
+def _rounded(scaled):
+    # (int64 units, mask of values too large for int64) for already-scaled magnitudes
+    rounded = np.rint(scaled)
+    huge = rounded >= _INT64_LIMIT
+    return np.where(huge, 0, rounded).astype(np.int64), huge
+
+
+def format_number_labels(values, label_format="Formatted Values"):
+    """Text labels for a whole column of numbers at once.
+
+    "Formatted Values" gives 1.23B / 4.56M / 7.89K, and "Actual Values"
+    gives comma-separated whole numbers (1,234,567). The scale is picked
+    after rounding, so 999.996 is 1.00K rather than 1000.00. Negative
+    numbers keep their sign and scale, NaN becomes an empty label, and
+    non-numeric columns are returned unchanged. A Series comes back with
+    its index.
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    if not pd.api.types.is_numeric_dtype(series.dtype):
+        return values
+
+    numbers = series.to_numpy(dtype='float64', na_value=np.nan)
+    missing = ~np.isfinite(numbers)
+    magnitude = np.where(missing, 0.0, np.abs(numbers))
+
+    if label_format == "Actual Values":
+        units, huge = _rounded(magnitude)
+        text = _thousands(units)
+        if huge.any():
+            text = text.astype(object)
+            text[huge] = [f'{value:,.0f}' for value in magnitude[huge]]
+    else:
+        scales = [scale for scale, _ in _SCALES]
+        reached = [magnitude >= scale for scale in scales]
+        divisors = np.select(reached, scales, 1)
+        units, _ = _rounded(magnitude / divisors * 100)
+        # A value that rounds up to 1000 of its scale moves to the next one (999.996 -> 1.00K)
+        for scale, smaller in zip(scales, scales[1:] + [1]):
+            promote = (divisors == smaller) & (units >= 100_000)
+            divisors = np.where(promote, scale, divisors)
+        units, huge = _rounded(magnitude / divisors * 100)
+        suffixes = np.select([divisors == scale for scale in scales], [suffix for _, suffix in _SCALES], '')
+        text = _two_decimals(units)
+        # Small whole-number columns (counts) stay whole numbers
+        if pd.api.types.is_integer_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+            text = np.where(divisors == 1, magnitude.astype(np.int64).astype(str), text)
+        if huge.any():
+            text = text.astype(object)
+            text[huge] = [f'{value:.2f}' for value in (magnitude / divisors)[huge]]
+        text = np.char.add(text.astype(str), suffixes)
+
+    # Values that round to zero lose their sign, as with f'{-0.001:,.0f}'
+    negative = (numbers < 0) & ((units > 0) | huge)
+    text = np.where(negative, np.char.add('-', text.astype(str)), text.astype(str))
+    labels = text.astype(object)
+    labels[missing] = ''
+    if isinstance(values, pd.Series):
+        return pd.Series(labels, index=values.index, dtype=object)
+    return labels
+
+
+def format_large_numbers(num):
+    """Format a single number the way ``format_number_labels`` formats a column."""
+    return format_number_labels(np.asarray([num]))[0]
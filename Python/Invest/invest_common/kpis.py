@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+
+# KPI card periods and how many months each one spans; "All Time" has no bounds
+KPI_PERIODS = {"All Time": None, "Year to Date": 12, "Quarter to Date": 3, "Month to Date": 1}
+
+
+def month_number(year, month):
+    """Months since year 0, so consecutive months are consecutive integers."""
+    return year * 12 + month - 1
+
+
+def period_bounds(period, today=None):
+    """``(start, end)`` month numbers of ``period`` up to ``today``'s month, and of the period before it.
+
+    Returns ``(None, None)`` for "All Time". Each range is half-open; the
+    prior range is the same months one period earlier.
+    """
+    length = KPI_PERIODS[period]
+    if length is None:
+        return None, None
+    today = pd.Timestamp.now() if today is None else pd.Timestamp(today)
+    current = month_number(today.year, today.month)
+    # Periods start on a multiple of their length counted from January
+    start = current - (today.month - 1) % length
+    return (start, current + 1), (start - length, current + 1 - length)
+
+
+class PeriodTotals:
+    """Running AmtExt sums and counts by month per Investment Type.
+
+    Built once per data load. The total over any run of months is the
+    difference of two cumulative sums, so the KPI cards and the Card
+    reports are lookups instead of rescans of the filtered ledger rows.
+    Entries without a posting date only count towards unbounded totals.
+    """
+
+    def __init__(self, G_LEntry_filtered):
+        codes, types = pd.factorize(G_LEntry_filtered['Investment Type'])
+        self._rows = {investment_type: row for row, investment_type in enumerate(types)}
+        amounts = G_LEntry_filtered['AmtExt'].to_numpy(dtype='float64', na_value=0.0)
+        counted = G_LEntry_filtered['AmtExt'].notna().to_numpy(dtype='float64')
+        years = G_LEntry_filtered['Year'].to_numpy(dtype='float64', na_value=np.nan)
+        months = G_LEntry_filtered['Month'].to_numpy(dtype='float64', na_value=np.nan)
+        dated = ~np.isnan(years) & ~np.isnan(months) & (codes >= 0)
+
+        numbers = month_number(years[dated], months[dated]).astype(np.int64)
+        self.first_month = int(numbers.min()) if len(numbers) else 0
+        span = int(numbers.max()) - self.first_month + 1 if len(numbers) else 0
+
+        # One row per investment type plus a last row for all of them; column k holds the months before k
+        rows = len(types) + 1
+        cells = codes[dated] * span + (numbers - self.first_month)
+        self._sums = self._running(np.bincount(cells, amounts[dated], minlength=(rows - 1) * span), rows, span)
+        self._counts = self._running(np.bincount(cells, counted[dated], minlength=(rows - 1) * span), rows, span)
+
+        undated = ~dated & (codes >= 0)
+        self._undated_sums = np.bincount(codes[undated], amounts[undated], minlength=rows)
+        self._undated_counts = np.bincount(codes[undated], counted[undated], minlength=rows)
+        self._undated_sums[-1] = self._undated_sums[:-1].sum()
+        self._undated_counts[-1] = self._undated_counts[:-1].sum()
+
+    @staticmethod
+    def _running(monthly, rows, span):
+        running = np.zeros((rows, span + 1))
+        running[:-1, 1:] = np.cumsum(monthly.reshape(rows - 1, span), axis=1)
+        running[-1] = running[:-1].sum(axis=0)
+        return running
+
+    def _row(self, investment_type):
+        if investment_type == 'All':
+            return len(self._rows)
+        return self._rows.get(investment_type)
+
+    def _sum(self, running, row, start, end, month):
+        # Offsets into the running totals, clipped to the months the ledger covers
+        span = running.shape[1] - 1
+        start = 0 if start is None else min(max(start - self.first_month, 0), span)
+        end = span if end is None else min(max(end - self.first_month, start), span)
+        if month == 'All':
+            return running[row, end] - running[row, start]
+        # A calendar month across years: one month-long difference per year in the window
+        first = start + (int(month) - 1 - (self.first_month + start)) % 12
+        offsets = np.arange(first, end, 12)
+        return (running[row, offsets + 1] - running[row, offsets]).sum()
+
+    def total(self, start=None, end=None, stat='sum', investment_type='All', year='All', month='All', quarter='All'):
+        """AmtExt ``stat`` ('sum' or 'mean') over months ``[start, end)`` matching the sidebar selections."""
+        row = self._row(investment_type)
+        if row is None:
+            return 0.0 if stat == 'sum' else np.nan
+
+        # Year and quarter selections narrow the window to their months
+        unbounded = start is None and end is None and year == 'All' and month == 'All' and quarter == 'All'
+        if year != 'All':
+            start = max(start, month_number(int(year), 1)) if start is not None else month_number(int(year), 1)
+            end = min(end, month_number(int(year) + 1, 1)) if end is not None else month_number(int(year) + 1, 1)
+        if quarter != 'All':
+            quarter_period = pd.Period(quarter, freq='Q')
+            first = month_number(quarter_period.year, quarter_period.quarter * 3 - 2)
+            start = first if start is None else max(start, first)
+            end = first + 3 if end is None else min(end, first + 3)
+
+        value = self._sum(self._sums, row, start, end, month)
+        count = self._sum(self._counts, row, start, end, month)
+        if unbounded:
+            value += self._undated_sums[row]
+            count += self._undated_counts[row]
+        if stat == 'mean':
+            return value / count if count else np.nan
+        return value
+
+    def kpi(self, period, stat='sum', today=None, **filters):
+        """``(value, prior)`` for a card over ``period``; ``prior`` is ``None`` for "All Time"."""
+        current, prior = period_bounds(period, today)
+        if current is None:
+            return self.total(stat=stat, **filters), None
+        return self.total(*current, stat=stat, **filters), self.total(*prior, stat=stat, **filters)
+
+
+def period_mask(data, period, today=None):
+    """Rows of ``data`` posted within ``period``, for card values that aren't running totals."""
+    current, _ = period_bounds(period, today)
+    if current is None:
+        return np.ones(len(data), dtype=bool)
+    numbers = month_number(data['Year'].to_numpy(dtype='float64', na_value=np.nan),
+                           data['Month'].to_numpy(dtype='float64', na_value=np.nan))
+    return (numbers >= current[0]) & (numbers < current[1])
@@ -0,0 +1,357 @@
+import re
+
+import pandas as pd
+
+from .cache import cache_key
+from .dtypes import concat_rows, optimize_dtypes
+
+# The two halves of the General Ledger entry table, joined on Entry No_
+GL_ENTRY_TABLE = "[UON PEN RBS$G_L Entry$7d966dd5-a317-4db2-b529-926bbce15abf]"
+GL_ENTRY_EXT_TABLE = "[UON PEN RBS$G_L Entry$437dbf0e-84ff-417a-965d-ed2bb9650972]"
+
+
+def unique_column_names(names):
+    """``names`` with repeats renamed ``name_1``, ``name_2``, ... in order; the first keeps its name.
+
+    A suffix that is already some column's name is skipped, so every
+    result is unique. One pass over the names, with a counter per name.
+    """
+    taken = set(names)
+    assigned = set()
+    counters = {}
+    unique = []
+    for name in names:
+        if name not in assigned:
+            unique_name = name
+        else:
+            number = counters.get(name, 0)
+            while True:
+                number += 1
+                unique_name = f"{name}_{number}"
+                if unique_name not in taken and unique_name not in assigned:
+                    break
+            counters[name] = number
+        assigned.add(unique_name)
+        unique.append(unique_name)
+    return unique
+
+
+def read_sql_chunks(connection, sql, params=(), chunk_size=50_000):
+    """Frames of at most ``chunk_size`` rows from ``sql``, like ``pd.read_sql`` with ``chunksize``.
+
+    Column names are made unique from the cursor description before any
+    row is fetched (see ``unique_column_names``), so a ``SELECT *`` over a
+    join never builds a frame with repeated labels. Yields one empty
+    frame when there are no rows, and closes the cursor when done.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(sql, params)
+        columns = unique_column_names([column[0] for column in cursor.description])
+        fetched = False
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            fetched = True
+            yield pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+        if not fetched:
+            yield pd.DataFrame(columns=columns)
+    finally:
+        cursor.close()
+
+
+# Columns every dashboard needs from the ledger
+LEDGER_COLUMNS = ['Entry No_', 'G_L Account No_', 'PDateExt', 'AmtExt']
+
+# Columns present in both joined tables must be qualified when projected without the tables' schemas
+_QUALIFIED_COLUMNS = {'Entry No_': 'a', 'G_L Account No_': 'a'}
+
+# What ``SELECT *`` adds after both tables' columns, for the account of the extension table
+_SELECT_ALL_EXTRA = ('b', 'G_L Account No_')
+
+# Build Report widget keys holding a ledger column, with the report number when there are several reports
+_REPORT_COLUMN_KEY = re.compile(r"^(x_axis|y_axis|column)(_\d+)?$")
+
+# Columns added by enrich_ledger, never selected from the database
+DERIVED_COLUMNS = {'Investment Type', 'Year', 'Month', 'Quarter'}
+
+
+def quote_identifier(name):
+    return "[" + name.replace("]", "]]") + "]"
+
+
+def column_expression(column, sources=None):
+    """``column`` of the joined tables as an SQL expression, qualified like ``select_list`` qualifies it."""
+    if sources is not None:
+        alias, name = sources[column]
+        return f"{alias}.{quote_identifier(name)}"
+    if column in _QUALIFIED_COLUMNS:
+        return f"{_QUALIFIED_COLUMNS[column]}.{quote_identifier(column)}"
+    return quote_identifier(column)
+
+
+def select_list(columns, sources=None):
+    """SQL select list for ``columns``; ``None`` selects every column.
+
+    With ``sources`` (see ``ledger_column_sources``) every column is
+    qualified with its table's alias, and a suffixed name is selected as
+    the other table's column under that name. Columns neither table has
+    are left out, so a stale Build Report choice can't break the query.
+    """
+    if columns is None:
+        return f"*, {_SELECT_ALL_EXTRA[0]}.{quote_identifier(_SELECT_ALL_EXTRA[1])}"
+    selected = []
+    for column in dict.fromkeys(columns):
+        if sources is not None and column not in sources:
+            continue
+        projected = column_expression(column, sources)
+        if sources is not None and sources[column][1] != column:
+            projected += f" AS {quote_identifier(column)}"
+        selected.append(projected)
+    return ", ".join(selected)
+
+
+def ledger_column_sources(connection):
+    """``{name: (alias, column)}`` for every column name ``SELECT *`` over the joined tables gives.
+
+    Reads both tables' cursor descriptions without fetching rows, and
+    names repeats as ``read_sql_chunks`` does: a column in both tables is
+    ``name`` from ``a`` and ``name_1`` from ``b``.
+    """
+    sourced = []
+    cursor = connection.cursor()
+    try:
+        for alias, table in (('a', GL_ENTRY_TABLE), ('b', GL_ENTRY_EXT_TABLE)):
+            cursor.execute(f"SELECT * FROM {table} WHERE 1 = 0")
+            sourced.extend((alias, column[0]) for column in cursor.description)
+            cursor.fetchall()
+    finally:
+        cursor.close()
+    sourced.append(_SELECT_ALL_EXTRA)
+    return dict(zip(unique_column_names([name for _, name in sourced]), sourced))
+
+
+def account_condition(accounts):
+    """Return (sql, params) restricting the join to the given G/L accounts."""
+    accounts = sorted(accounts)
+    return f"a.[G_L Account No_] IN ({', '.join('?' * len(accounts))})", accounts
+
+
+def build_ledger_query(since_entry_no=None, columns=None, accounts=None, sources=None, through_entry_no=None):
+    """Return (sql, params) for the joined G/L Entry pull.
+
+    ``columns`` projects the select list (``None`` keeps every column),
+    qualified by ``sources`` when given (see ``select_list``),
+    ``accounts`` restricts the pull to those G/L accounts,
+    ``since_entry_no`` selects only entries above that high-water mark
+    and ``through_entry_no`` only entries up to and including it.
+    """
+    sql = f"""
+    SELECT {select_list(columns, sources)}
+    FROM {GL_ENTRY_TABLE} a
+    JOIN {GL_ENTRY_EXT_TABLE} b
+    ON a.[Entry No_] = b.[Entry No_]
+    """
+    conditions = []
+    params = []
+    if accounts:
+        condition, account_params = account_condition(accounts)
+        conditions.append(condition)
+        params.extend(account_params)
+    if since_entry_no is not None:
+        conditions.append("a.[Entry No_] > ?")
+        params.append(since_entry_no)
+    if through_entry_no is not None:
+        conditions.append("a.[Entry No_] <= ?")
+        params.append(through_entry_no)
+    if conditions:
+        sql += "WHERE " + "\n    AND ".join(conditions) + "\n    "
+    sql += "ORDER BY a.[Entry No_]\n"
+    return sql, params
+
+
+def report_columns(session_state):
+    """Ledger columns picked in Build Report widgets (``x_axis``, ``y_axis``, ``column`` keys).
+
+    A card only uses its ``column`` and a chart only its axes; a value
+    left over from a report's earlier chart type is ignored.
+    """
+    columns = []
+    for key in list(session_state.keys()):
+        match = _REPORT_COLUMN_KEY.match(str(key))
+        if match is None:
+            continue
+        field, number = match.groups()
+        chart_type = session_state.get(f"chart_type{number or ''}")
+        if chart_type is not None and (chart_type == "Card") != (field == "column"):
+            continue
+        column = session_state[key]
+        # Skip derived columns; suffixed names are resolved to their table by ledger_column_sources
+        if isinstance(column, str) and column not in DERIVED_COLUMNS:
+            columns.append(column)
+    return sorted(set(columns))
+
+
+def enrich_ledger(G_LEntry, investment_type_mapping):
+    """Map accounts to investment types, drop 'Other' and derive Year/Month/Quarter."""
+    # Create Investment Type column; unmapped accounts are the "Other" type
+    investment_type = G_LEntry['G_L Account No_'].map(investment_type_mapping)
+
+    # Filter out "Other" investment type
+    keep = investment_type.notna()
+    G_LEntry_filtered = G_LEntry[keep].assign(**{'Investment Type': investment_type[keep]})
+
+    # Convert PDateExt to datetime
+    G_LEntry_filtered['PDateExt'] = pd.to_datetime(G_LEntry_filtered['PDateExt'], errors='coerce')
+
+    # Extract year, month, and quarter from PDateExt
+    G_LEntry_filtered['Year'] = G_LEntry_filtered['PDateExt'].dt.year
+    G_LEntry_filtered['Month'] = G_LEntry_filtered['PDateExt'].dt.month
+    G_LEntry_filtered['Quarter'] = G_LEntry_filtered['PDateExt'].dt.to_period('Q')
+
+    # Store the new columns compactly
+    G_LEntry_filtered, _ = optimize_dtypes(G_LEntry_filtered)
+    return G_LEntry_filtered
+
+
+class IncrementalLedgerLoader:
+    """Keeps a local snapshot of the joined G/L Entry frame.
+
+    Each ``refresh`` only fetches entries whose ``Entry No_`` is greater
+    than the highest one already held, and appends them to the snapshot.
+    With a ``cache`` the snapshot is persisted, so a cold start resumes
+    from disk instead of re-pulling the whole ledger. ``columns`` are
+    pushed down into the query (see ``build_ledger_query``), each
+    qualified with its table from the schemas read on the first fetch.
+
+    With an ``investment_type_mapping`` only its accounts are pulled and
+    the snapshot is the enriched frame (see ``enrich_ledger``). Entries
+    are streamed ``chunk_size`` rows at a time, with repeated column names
+    made unique before fetching (see ``read_sql_chunks``), and each chunk
+    is enriched and compacted before the next is read, so the raw result
+    set is never held in full.
+
+    ``widen`` adds columns to a loaded snapshot by fetching only those
+    columns for the entries already held.
+    """
+
+    def __init__(self, cache=None, columns=None, investment_type_mapping=None, chunk_size=50_000):
+        self.cache = cache
+        self.columns = None if columns is None else list(dict.fromkeys(columns))
+        self.investment_type_mapping = investment_type_mapping
+        self.accounts = None if investment_type_mapping is None else sorted(investment_type_mapping)
+        self.chunk_size = chunk_size
+        self.snapshot = None
+        self.high_water_mark = None
+        self.memory_report = None
+        self.sources = None
+        self._cache_key = self._key()
+
+    def _key(self):
+        return cache_key(
+            *build_ledger_query(columns=self.columns, accounts=self.accounts), self.investment_type_mapping
+        )
+
+    def _load_cached_snapshot(self):
+        cached = self.cache.load('G_LEntry', self._cache_key)
+        if cached is not None:
+            self.snapshot, self.high_water_mark, self.memory_report = cached
+
+    def _process_chunk(self, chunk):
+        before = chunk.memory_usage(index=False, deep=True)
+        if self.investment_type_mapping is None:
+            chunk, _ = optimize_dtypes(chunk)
+        else:
+            chunk = enrich_ledger(chunk, self.investment_type_mapping)
+        after = chunk.memory_usage(index=False, deep=True)
+        return chunk, pd.DataFrame({'before': before, 'after': after}).fillna(0)
+
+    def fetch(self, connection, since_entry_no=None):
+        """Return ``(new_rows, high_water_mark)`` for entries above ``since_entry_no``."""
+        if self.columns is not None and self.sources is None:
+            self.sources = ledger_column_sources(connection)
+        sql, params = build_ledger_query(since_entry_no, self.columns, self.accounts, self.sources)
+        high_water_mark = since_entry_no
+        chunks = []
+        for chunk in read_sql_chunks(connection, sql, params, self.chunk_size):
+            # Rows arrive ordered by Entry No_, so the last one is the chunk's high-water mark
+            if len(chunk):
+                high_water_mark = int(chunk.iloc[-1, list(chunk.columns).index('Entry No_')])
+            chunk, report = self._process_chunk(chunk)
+            chunks.append(chunk)
+
+            # Running before/after totals for everything fetched into the snapshot
+            if not len(chunk):
+                continue
+            if self.memory_report is None:
+                self.memory_report = report
+            else:
+                self.memory_report = self.memory_report.add(report, fill_value=0)
+
+        return concat_rows(chunks), high_water_mark
+
+    def refresh(self, connection):
+        if self.snapshot is None and self.cache is not None:
+            self._load_cached_snapshot()
+
+        new_rows, high_water_mark = self.fetch(connection, self.high_water_mark)
+        if self.snapshot is None:
+            self.snapshot = new_rows
+        elif len(new_rows):
+            self.snapshot = concat_rows([self.snapshot, new_rows])
+
+        if high_water_mark != self.high_water_mark:
+            self.high_water_mark = high_water_mark
+            if self.cache is not None:
+                self.cache.save('G_LEntry', self._cache_key, self.snapshot, self.high_water_mark, self.memory_report)
+
+        # Shallow copy so callers can add columns without touching the snapshot
+        return self.snapshot.copy(deep=False)
+
+    def widen(self, connection, columns):
+        """Add the database columns of ``columns`` (``None``: every column) the snapshot lacks.
+
+        Returns the columns added, ``[]`` when the snapshot already has
+        them all. Only ``Entry No_`` and the added columns are fetched,
+        for the entries up to the high-water mark, and lined up with the
+        snapshot's rows by ``Entry No_``; the next ``refresh`` fetches the
+        widened columns for new entries.
+        """
+        if self.columns is None:
+            return []
+        if self.sources is None:
+            self.sources = ledger_column_sources(connection)
+        wanted = self.sources if columns is None else columns
+        missing = [
+            column for column in dict.fromkeys(wanted)
+            if column in self.sources and column not in self.columns and column not in DERIVED_COLUMNS
+        ]
+        if not missing:
+            return []
+
+        if self.snapshot is not None:
+            sql, params = build_ledger_query(
+                columns=['Entry No_'] + missing, accounts=self.accounts, sources=self.sources,
+                through_entry_no=self.high_water_mark
+            )
+            chunks = []
+            for chunk in read_sql_chunks(connection, sql, params, self.chunk_size):
+                chunk, report = optimize_dtypes(chunk)
+                chunks.append(chunk)
+                if not len(chunk):
+                    continue
+                # Entry No_ is already counted in the report
+                report = report.drop(index='Entry No_')
+                if self.memory_report is None:
+                    self.memory_report = report
+                else:
+                    self.memory_report = self.memory_report.add(report, fill_value=0)
+            added = concat_rows(chunks).set_index('Entry No_').reindex(self.snapshot['Entry No_'])
+            self.snapshot = self.snapshot.assign(**{column: added[column].array for column in missing})
+
+        self.columns = self.columns + missing
+        self._cache_key = self._key()
+        if self.cache is not None and self.snapshot is not None:
+            self.cache.save('G_LEntry', self._cache_key, self.snapshot, self.high_water_mark, self.memory_report)
+        return missing
@@ -0,0 +1,106 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import streamlit as st
+
+from .db import get_connection_pool
+from .shared import get_shared_ledger
+
+# Seconds between background checks for new ledger entries
+REFRESH_INTERVAL = 300
+
+
+class LedgerRefresher:
+    """Refreshes the shared ledger from a worker thread (stale-while-revalidate).
+
+    ``dataset`` returns the last good ``LedgerDataset`` straight away and
+    only blocks on the database the first time a mapping, or a column it
+    hasn't loaded, is asked for. A daemon thread then refreshes every
+    requested mapping each ``interval`` seconds, and a request for a
+    snapshot older than that wakes it early. A failed refresh keeps the
+    previous snapshot and is kept in ``last_error``. The timing comes
+    from the shared ledger's ``clock``.
+    """
+
+    def __init__(self, shared_ledger, pool, interval=REFRESH_INTERVAL, background=True):
+        self.shared_ledger = shared_ledger
+        self.pool = pool
+        self.interval = interval
+        self.background = background
+        self.last_error = None
+        self._specs = OrderedDict()
+        self._specs_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def _refresh(self, columns, investment_type_mapping):
+        with self.pool.connection() as connection:
+            return self.shared_ledger.refresh(connection, columns, investment_type_mapping)
+
+    def dataset(self, columns, investment_type_mapping):
+        """The current ``LedgerDataset`` for this mapping, loading it only if there is none with ``columns`` yet."""
+        spec = self.shared_ledger.spec_for(investment_type_mapping)
+        with self._specs_lock:
+            self._specs[spec] = (columns, investment_type_mapping)
+            self._specs.move_to_end(spec)
+            # Stop refreshing mappings nobody has asked for recently
+            while len(self._specs) > self.shared_ledger.max_datasets:
+                self._specs.popitem(last=False)
+
+        dataset = self.shared_ledger.current(columns, investment_type_mapping)
+        if dataset is None:
+            dataset = self._refresh(columns, investment_type_mapping)
+        elif self.shared_ledger.clock() - dataset.refreshed_at >= self.interval:
+            self._wake.set()
+
+        if self.background:
+            self.start()
+        return dataset
+
+    def refresh_all(self):
+        """Refresh every requested mapping once; errors are recorded, not raised."""
+        with self._specs_lock:
+            specs = list(self._specs.values())
+        last_error = None
+        for columns, investment_type_mapping in specs:
+            try:
+                self._refresh(columns, investment_type_mapping)
+            except Exception as error:
+                last_error = error
+        self.last_error = last_error
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopped.is_set():
+                return
+            self.refresh_all()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="ledger-refresher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def describe_refreshed_at(dataset, last_error=None):
+    """Sidebar caption with the time of the snapshot being shown."""
+    text = f"Data as of {datetime.fromtimestamp(dataset.refreshed_at):%Y-%m-%d %H:%M:%S}"
+    if last_error is not None:
+        text += " (last refresh failed, showing the previous snapshot)"
+    return text
+
+
+@st.cache_resource
+def get_ledger_refresher():
+    """The ``LedgerRefresher`` for this Streamlit process."""
+    return LedgerRefresher(get_shared_ledger(), get_connection_pool())
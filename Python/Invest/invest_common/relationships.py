@@ -0,0 +1,279 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Data Modeling join types, as pandas names them
+JOIN_TYPES = ["inner", "left", "right", "outer"]
+
+# Rows of each relationship shown on the Data Modeling tab
+PREVIEW_ROWS = 10
+
+# Estimated in-memory size of a full join above which it is flagged, and above which it is refused
+JOIN_WARN_BYTES = 64 * 1024 ** 2
+MAX_JOIN_BYTES = 512 * 1024 ** 2
+
+
+def relationship_definition(left_table, right_table, left_column, right_column, join_type):
+    """Session state entry for one relationship: which tables and columns to join, not the joined rows."""
+    if join_type not in JOIN_TYPES:
+        raise ValueError(f"Unknown join type: {join_type}")
+    return {
+        "left_table": left_table,
+        "right_table": right_table,
+        "left_column": left_column,
+        "right_column": right_column,
+        "join_type": join_type,
+    }
+
+
+class KeyIndex:
+    """Where each distinct value of one table column is.
+
+    ``codes`` numbers every row's key, ``keys`` holds the distinct keys
+    and ``counts`` their rows. ``order`` lists row positions grouped by
+    key, in table order within a key, with key ``c`` at
+    ``order[starts[c]:starts[c + 1]]``. Missing values are a key of
+    their own, as pandas matches them to each other.
+    """
+
+    def __init__(self, column):
+        codes, keys = pd.factorize(column, use_na_sentinel=False)
+        if isinstance(keys, pd.Categorical):
+            keys = np.asarray(keys)
+        self.codes = codes
+        self.keys = pd.Index(keys)
+        self.numeric = pd.api.types.is_numeric_dtype(self.keys.dtype)
+        self.counts = np.bincount(codes, minlength=len(self.keys))
+        self.starts = np.concatenate([[0], np.cumsum(self.counts)])
+        self.order = np.argsort(codes, kind='stable')
+
+    def matches(self, other):
+        """Code in ``other`` of each of this index's keys, or -1 where ``other`` doesn't have it."""
+        if self.numeric != other.numeric and len(self.keys) and len(other.keys):
+            raise ValueError(f"can't join {self.keys.dtype} keys to {other.keys.dtype} keys")
+        return other.keys.get_indexer(self.keys)
+
+
+class KeyIndexCache:
+    """``KeyIndex`` per (table name, column), and key matches per column pair, for one ledger load.
+
+    Every relationship and rerun joining on a column reuses its index,
+    so repeated joins gather rows instead of hashing the keys again.
+    Entries are kept with the frames they were built from and rebuilt
+    when a table is reloaded under the same name. Only the ``max_size``
+    most recently used entries are kept.
+    """
+
+    def __init__(self, max_size=16):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get(self, key, sources, build):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and all(held is source for held, source in zip(entry[0], sources)):
+                self._entries.move_to_end(key)
+                return entry[1]
+        value = build()
+        with self._lock:
+            self._entries[key] = (sources, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return value
+
+    def index(self, table_name, table, column):
+        return self._get(("index", table_name, column), (table,), lambda: KeyIndex(table[column]))
+
+    def matches(self, left_key, left_index, right_key, right_index):
+        return self._get(
+            ("matches", left_key, right_key), (left_index, right_index), lambda: left_index.matches(right_index)
+        )
+
+
+class _JoinKeys:
+    # A relationship's two KeyIndexes and how their keys match, from the cache when there is one
+    def __init__(self, left, right, relationship, key_indexes):
+        left_key = (relationship['left_table'], relationship['left_column'])
+        right_key = (relationship['right_table'], relationship['right_column'])
+        if key_indexes is None:
+            self.left = KeyIndex(left[left_key[1]])
+            self.right = KeyIndex(right[right_key[1]])
+            self.left_to_right = self.left.matches(self.right)
+        else:
+            self.left = key_indexes.index(left_key[0], left, left_key[1])
+            self.right = key_indexes.index(right_key[0], right, right_key[1])
+            self.left_to_right = key_indexes.matches(left_key, self.left, right_key, self.right)
+
+        # Right keys some left key matches; each right key matches at most one left key
+        self.right_matched = np.zeros(len(self.right.keys), dtype=bool)
+        self.right_matched[self.left_to_right[self.left_to_right >= 0]] = True
+
+
+def _bytes_per_row(table):
+    return table.memory_usage(deep=True, index=False).sum() / max(len(table), 1)
+
+
+def estimate_join(left, right, relationship, key_indexes=None):
+    """Size of the relationship's join, worked out from the key histograms of each side without joining.
+
+    Returns a dict with the distinct key counts of each side, the
+    ``kind`` of relationship (``"one-to-many"`` and so on, from whether
+    keys repeat on each side), the joined ``rows`` and an estimate of
+    their in-memory ``bytes``. The histograms come from ``key_indexes``,
+    a ``KeyIndexCache``, when it is given.
+    """
+    keys = _JoinKeys(left, right, relationship, key_indexes)
+    found = keys.left_to_right >= 0
+    matched = int((keys.left.counts[found] * keys.right.counts[keys.left_to_right[found]]).sum())
+    left_only = int(keys.left.counts[~found].sum())
+    right_only = int(keys.right.counts[~keys.right_matched].sum())
+    rows = {
+        "inner": matched,
+        "left": matched + left_only,
+        "right": matched + right_only,
+        "outer": matched + left_only + right_only,
+    }[relationship['join_type']]
+
+    left_side = "many" if len(keys.left.counts) and keys.left.counts.max() > 1 else "one"
+    right_side = "many" if len(keys.right.counts) and keys.right.counts.max() > 1 else "one"
+    return {
+        "left_distinct": len(keys.left.keys),
+        "right_distinct": len(keys.right.keys),
+        "kind": f"{left_side}-to-{right_side}",
+        "rows": rows,
+        "bytes": int(rows * (_bytes_per_row(left) + _bytes_per_row(right))),
+    }
+
+
+def describe_join_estimate(estimate):
+    return (
+        f"{estimate['rows']:,} rows, about {estimate['bytes'] / 1024 ** 2:,.1f} MB; {estimate['kind']} "
+        f"({estimate['left_distinct']:,} left keys, {estimate['right_distinct']:,} right keys)"
+    )
+
+
+def check_join_budget(estimate, warn_bytes=JOIN_WARN_BYTES, max_bytes=MAX_JOIN_BYTES):
+    """``(status, message)`` for building the full join: "success", "warning", or "error" when it is refused."""
+    advice = ""
+    if estimate['kind'] == "many-to-many":
+        advice = " Keys repeat on both sides; a column that is unique on one side gives a one-to-many join."
+    size = describe_join_estimate(estimate)
+    if estimate['bytes'] > max_bytes:
+        return "error", f"Join refused: {size} is over the {max_bytes / 1024 ** 2:,.0f} MB limit.{advice}"
+    if estimate['bytes'] > warn_bytes or estimate['kind'] == "many-to-many":
+        return "warning", f"Large join: {size}.{advice}"
+    return "success", size
+
+
+def _gather(other, rows, other_codes, keep_unmatched, limit):
+    # Each row repeated once per row of ``other`` its key matches (at most ``limit`` times), next to
+    # the positions of those matches; -1 stands in for the match of an unmatched row that is kept
+    if not len(other.order):
+        kept = rows if keep_unmatched else rows[:0]
+        return kept, np.full(len(kept), -1, dtype=np.intp)
+    found = other_codes >= 0
+    safe_codes = np.where(found, other_codes, 0)
+    matches = np.where(found, other.counts[safe_codes], 0)
+    if limit is not None:
+        matches = np.minimum(matches, limit)
+    repeats = np.maximum(matches, 1) if keep_unmatched else matches
+
+    positions = np.repeat(rows, repeats)
+    within = np.arange(len(positions)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+    starts = np.repeat(other.starts[safe_codes], repeats) + within
+    other_positions = np.where(
+        np.repeat(matches, repeats) > 0, other.order[np.minimum(starts, len(other.order) - 1)], -1
+    )
+    return positions, other_positions
+
+
+def _join_positions(keys, join_type, limit=None):
+    # (left positions, right positions) of the joined rows, -1 on the missing side of unmatched rows
+    if join_type == "right":
+        right_to_left = np.full(len(keys.right.keys), -1, dtype=np.intp)
+        found = keys.left_to_right >= 0
+        right_to_left[keys.left_to_right[found]] = np.flatnonzero(found)
+        rows = np.arange(len(keys.right.codes))[:limit]
+        right_positions, left_positions = _gather(keys.left, rows, right_to_left[keys.right.codes[rows]], True, limit)
+        return left_positions, right_positions
+
+    rows = np.arange(len(keys.left.codes))
+    if join_type == "inner":
+        rows = rows[keys.left_to_right[keys.left.codes] >= 0]
+    rows = rows[:limit]
+    left_positions, right_positions = _gather(
+        keys.right, rows, keys.left_to_right[keys.left.codes[rows]], join_type != "inner", limit
+    )
+    if join_type == "outer":
+        # Right rows no left key matches follow the left join's rows
+        right_only = np.flatnonzero(~keys.right_matched[keys.right.codes])
+        if limit is not None:
+            right_only = right_only[:max(limit - len(left_positions), 0)]
+        left_positions = np.concatenate([left_positions, np.full(len(right_only), -1, dtype=np.intp)])
+        right_positions = np.concatenate([right_positions, right_only])
+    return left_positions, right_positions
+
+
+def _rows_at(table, positions):
+    # Rows of table at positions, all-missing rows at -1; a plain take when nothing is missing
+    table = table.reset_index(drop=True)
+    if (positions >= 0).all():
+        return table.take(positions).reset_index(drop=True)
+    return table.reindex(positions).reset_index(drop=True)
+
+
+def _assemble(left, right, relationship, left_positions, right_positions):
+    # The joined frame laid out like pd.merge's: left columns then right columns, shared names
+    # suffixed _x and _y, and a column joined to itself kept once
+    left_column, right_column = relationship['left_column'], relationship['right_column']
+    left_rows = _rows_at(left, left_positions)
+    right_rows = _rows_at(right, right_positions)
+
+    if left_column == right_column:
+        missing = left_positions < 0
+        if missing.any():
+            # Rows only the right side has take their key from it
+            key = pd.Series(np.where(
+                missing,
+                right_rows[right_column].to_numpy(dtype=object),
+                left_rows[left_column].to_numpy(dtype=object)
+            ))
+            if left[left_column].dtype == right[right_column].dtype and key.notna().all():
+                key = key.astype(left[left_column].dtype)
+            left_rows[left_column] = key.infer_objects()
+        right_rows = right_rows.drop(columns=right_column)
+    shared = left_rows.columns.intersection(right_rows.columns)
+    left_rows = left_rows.rename(columns={column: f"{column}_x" for column in shared})
+    right_rows = right_rows.rename(columns={column: f"{column}_y" for column in shared})
+    return pd.concat([left_rows, right_rows], axis=1)
+
+
+def preview_join(left, right, relationship, rows=PREVIEW_ROWS, key_indexes=None):
+    """First ``rows`` rows of the relationship's join, gathered without building the rest."""
+    keys = _JoinKeys(left, right, relationship, key_indexes)
+    left_positions, right_positions = _join_positions(keys, relationship['join_type'], limit=rows)
+    return _assemble(left, right, relationship, left_positions[:rows], right_positions[:rows])
+
+
+def join_tables(left, right, relationship, max_bytes=MAX_JOIN_BYTES, key_indexes=None):
+    """The relationship's full join; only run when every joined row is needed.
+
+    Rows come in pd.merge order, except that an outer join lists its
+    right-only rows after the left join's rows instead of sorting by key.
+    Raises ``ValueError`` instead of joining when the estimated size is
+    over ``max_bytes``.
+    """
+    estimate = estimate_join(left, right, relationship, key_indexes)
+    status, message = check_join_budget(estimate, max_bytes=max_bytes)
+    if status == "error":
+        raise ValueError(message)
+    keys = _JoinKeys(left, right, relationship, key_indexes)
+    left_positions, right_positions = _join_positions(keys, relationship['join_type'])
+    return _assemble(left, right, relationship, left_positions, right_positions)
@@ -0,0 +1,114 @@
+import json
+import os
+import re
+import threading
+
+from .charts import ChartCache
+
+# Build Report widget keys (suffixed with the report number) that make up a report definition
+REPORT_FIELDS = (
+    "chart_type", "card_name", "column", "period", "x_axis", "y_axis", "operator", "show_data_labels", "label_format"
+)
+
+# The fields each kind of report is defined by; any others are left over from an earlier chart type
+CARD_FIELDS = ("chart_type", "card_name", "column", "operator", "period")
+CHART_FIELDS = ("chart_type", "x_axis", "y_axis", "operator", "show_data_labels", "label_format")
+
+_REPORT_KEY = re.compile(rf"^({'|'.join(REPORT_FIELDS)})_\d+$")
+
+# Build Report widget state, for the single report pages too, plus each report's expander
+_BUILD_REPORT_KEY = re.compile(rf"^(({'|'.join(REPORT_FIELDS)})(_\d+)?|report_open_\d+|all_ledger_columns)$")
+
+
+def report_fields(chart_type):
+    """The ``REPORT_FIELDS`` that define a report of ``chart_type``."""
+    return CARD_FIELDS if chart_type == "Card" else CHART_FIELDS
+
+
+def new_report():
+    """Session state entry for one Build Report; figures are rebuilt from the widgets, not stored."""
+    return {"charts": ChartCache()}
+
+
+def report_is_open(session_state, i):
+    """Whether report ``i`` is expanded; a report that wasn't drawn yet is open only if it is the newest."""
+    return session_state.get(f"report_open_{i}", i == len(session_state.get('reports', [])) - 1)
+
+
+def keep_build_report_state(session_state):
+    """Carry the Build Report widget values over to the next rerun.
+
+    Streamlit forgets a widget's value on any run that doesn't draw it,
+    which is every run where the Build Report tab isn't selected or a
+    report is collapsed. Writing the values back makes them plain
+    session state until the widgets are drawn again.
+    """
+    for key in list(session_state.keys()):
+        if _BUILD_REPORT_KEY.match(str(key)):
+            session_state[key] = session_state[key]
+
+
+def report_specs(session_state):
+    """One small dict per report with the widget values that define it for its chart type."""
+    specs = []
+    for i in range(len(session_state.get('reports', []))):
+        fields = report_fields(session_state.get(f"chart_type_{i}"))
+        specs.append({field: session_state[f"{field}_{i}"] for field in fields if f"{field}_{i}" in session_state})
+    return specs
+
+
+def save_reports(path, specs):
+    """Write ``specs`` to ``path`` as JSON, replacing the file atomically."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(specs, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def load_reports(path, chart_types=None):
+    """Report specs saved at ``path``; an empty list when nothing was saved yet.
+
+    Specs whose chart type isn't in ``chart_types`` are skipped.
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        try:
+            specs = json.load(f)
+        except json.JSONDecodeError as error:
+            raise ValueError(f"{path} is not a saved report file: {error}") from error
+    if not isinstance(specs, list) or not all(isinstance(spec, dict) for spec in specs):
+        raise ValueError(f"{path} is not a saved report file")
+    if chart_types is not None:
+        specs = [spec for spec in specs if spec.get("chart_type", chart_types[0]) in chart_types]
+    return specs
+
+
+def save_report_state(path, session_state):
+    """Button callback: save the current reports' definitions to ``path``."""
+    save_reports(path, report_specs(session_state))
+    session_state['reports_message'] = ("success", f"Saved {len(session_state['reports'])} reports")
+
+
+def load_report_state(path, session_state, chart_types=None):
+    """Button callback: replace the current reports with the ones saved at ``path``.
+
+    Only widget values are restored; each report's aggregation and figure
+    are computed when it is next rendered.
+    """
+    try:
+        specs = load_reports(path, chart_types)
+    except (OSError, ValueError) as error:
+        session_state['reports_message'] = ("error", str(error))
+        return
+
+    for key in list(session_state.keys()):
+        if _REPORT_KEY.match(str(key)) or str(key).startswith("report_open_"):
+            del session_state[key]
+    session_state['reports'] = [new_report() for _ in specs]
+    for i, spec in enumerate(specs):
+        fields = report_fields(spec.get("chart_type"))
+        for field, value in spec.items():
+            if field in fields:
+                session_state[f"{field}_{i}"] = value
+    session_state['reports_message'] = ("success", f"Loaded {len(specs)} reports")
@@ -0,0 +1,136 @@
+import pandas as pd
+import streamlit as st
+
+from .db import get_connection_pool
+from .ledger import (
+    GL_ENTRY_EXT_TABLE, GL_ENTRY_TABLE, LEDGER_COLUMNS, account_condition, column_expression, enrich_ledger,
+    ledger_column_sources, select_list
+)
+
+# SQL Server date parts of PDateExt, formatted with its qualified column; a
+# SQLite stand-in needs YEAR and MONTH registered as functions
+DATE_PARTS = {
+    'Year': "YEAR({})",
+    'Month': "MONTH({})",
+    'Quarter': "(MONTH({}) + 2) / 3",
+}
+
+# Seconds a server-side rollup is reused, the same as the background ledger refresh interval
+ROLLUP_TTL = 300
+
+# Date columns each summary table is grouped by, ahead of Investment Type
+ROLLUP_GRAINS = {
+    'type': [],
+    'year': ['Year'],
+    'month': ['Year', 'Month'],
+    'quarter': ['Year', 'Quarter'],
+}
+
+
+def date_part(part, sources=None):
+    """SQL for a date part of PDateExt (see ``DATE_PARTS``), qualified by ``sources`` when given."""
+    return DATE_PARTS[part].format(column_expression('PDateExt', sources))
+
+
+def filter_conditions(investment_type_mapping, investment_type='All', year='All', month='All', quarter='All',
+                      sources=None):
+    """Return (conditions, params) for the sidebar selections."""
+    accounts = [
+        account for account, name in investment_type_mapping.items()
+        if investment_type == 'All' or name == investment_type
+    ]
+    condition, params = account_condition(accounts or [None])
+    conditions = [condition]
+    if year != 'All':
+        conditions.append(f"{date_part('Year', sources)} = ?")
+        params.append(int(year))
+    if month != 'All':
+        conditions.append(f"{date_part('Month', sources)} = ?")
+        params.append(int(month))
+    if quarter != 'All':
+        # Quarter selections come in as Period strings such as '2023Q1'
+        quarter_period = pd.Period(quarter, freq='Q')
+        conditions.append(f"{date_part('Year', sources)} = ? AND {date_part('Quarter', sources)} = ?")
+        params.extend([quarter_period.year, quarter_period.quarter])
+    return conditions, params
+
+
+def build_rollup_query(grain, investment_type_mapping, sources=None, **filters):
+    """Return (sql, params) summing AmtExt per G/L account and the grain's date parts.
+
+    The sidebar selections (``filters``) become WHERE conditions so only
+    the rolled-up rows leave the database. Columns are qualified by
+    ``sources`` (see ``ledger_column_sources``) when given.
+    """
+    parts = ROLLUP_GRAINS[grain]
+    conditions, params = filter_conditions(investment_type_mapping, sources=sources, **filters)
+
+    account = column_expression('G_L Account No_', sources)
+    select = [f"{account} AS [G_L Account No_]"]
+    select += [f"{date_part(part, sources)} AS [{part}]" for part in parts]
+    group_by = [account] + [date_part(part, sources) for part in parts]
+
+    sql = f"""
+    SELECT {', '.join(select)}, SUM({column_expression('AmtExt', sources)}) AS [AmtExt]
+    FROM {GL_ENTRY_TABLE} a
+    JOIN {GL_ENTRY_EXT_TABLE} b
+    ON a.[Entry No_] = b.[Entry No_]
+    WHERE {' AND '.join(conditions)}
+    GROUP BY {', '.join(group_by)}
+    """
+    return sql, params
+
+
+def load_rollup(connection, grain, investment_type_mapping, **filters):
+    """Run the grain's GROUP BY on the server and shape it like the pandas summaries."""
+    sql, params = build_rollup_query(grain, investment_type_mapping, ledger_column_sources(connection), **filters)
+    rollup = pd.read_sql(sql, connection, params=params)
+
+    parts = ROLLUP_GRAINS[grain]
+    rollup['Investment Type'] = rollup['G_L Account No_'].map(investment_type_mapping)
+
+    # Entries without a posting date have no Year/Month/Quarter, as with pandas groupby
+    rollup = rollup.dropna(subset=parts)
+    for part in parts:
+        rollup[part] = rollup[part].astype(int)
+    if 'Quarter' in parts:
+        rollup['Quarter'] = pd.to_datetime(pd.DataFrame({
+            'year': rollup['Year'], 'month': rollup['Quarter'] * 3 - 2, 'day': 1,
+        })).dt.to_period('Q')
+
+    return rollup.groupby(parts + ['Investment Type'], as_index=False)['AmtExt'].sum()
+
+
+def load_ledger_preview(connection, investment_type_mapping, rows=10, **filters):
+    """Fetch and enrich only the first ``rows`` entries matching the sidebar selections."""
+    sources = ledger_column_sources(connection)
+    conditions, params = filter_conditions(investment_type_mapping, sources=sources, **filters)
+    sql = f"""
+    SELECT {select_list(LEDGER_COLUMNS, sources)}
+    FROM {GL_ENTRY_TABLE} a
+    JOIN {GL_ENTRY_EXT_TABLE} b
+    ON a.[Entry No_] = b.[Entry No_]
+    WHERE {' AND '.join(conditions)}
+    ORDER BY a.[Entry No_]
+    """
+    chunks = pd.read_sql(sql, connection, params=params, chunksize=rows)
+    preview = next(chunks, None)
+    # Close the cursor so the pooled connection has no pending results
+    chunks.close()
+    if preview is None:
+        preview = pd.DataFrame(columns=LEDGER_COLUMNS)
+    return enrich_ledger(preview, investment_type_mapping)
+
+
+@st.cache_data(ttl=ROLLUP_TTL, show_spinner=False)
+def cached_rollup(grain, investment_type_mapping, **filters):
+    """``load_rollup`` on a pooled connection, reused for ``ROLLUP_TTL`` seconds per grain, filters and mapping."""
+    with get_connection_pool().connection() as connection:
+        return load_rollup(connection, grain, investment_type_mapping, **filters)
+
+
+@st.cache_data(ttl=ROLLUP_TTL, show_spinner=False)
+def cached_ledger_preview(investment_type_mapping, rows=10, **filters):
+    """``load_ledger_preview`` on a pooled connection, reused like ``cached_rollup``."""
+    with get_connection_pool().connection() as connection:
+        return load_ledger_preview(connection, investment_type_mapping, rows, **filters)
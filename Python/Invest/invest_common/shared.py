@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+
+from .aggregates import AggregationCache
+from .cache import LedgerCache
+from .cube import LedgerCube
+from .filters import LedgerFilter
+from .kpis import PeriodTotals
+from .ledger import DERIVED_COLUMNS, IncrementalLedgerLoader
+from .relationships import KeyIndexCache
+
+
+class LedgerDataset:
+    """Frames and indexes for one ledger load, shared read-only by every session."""
+
+    def __init__(self, loader, G_LEntry_filtered):
+        self.high_water_mark = loader.high_water_mark
+        self.memory_report = loader.memory_report
+        # The database columns the load holds (None: every column), to tell which requests it covers
+        self.columns = None if loader.columns is None else frozenset(loader.columns)
+        self.sources = loader.sources
+        # The loader only pulls the mapped accounts, so the ledger and its
+        # enriched, filtered view are the same frame
+        self.G_LEntry = G_LEntry_filtered
+        self.G_LEntry_filtered = G_LEntry_filtered
+        # When the database was last checked for new entries, stamped by SharedLedger.refresh
+        self.refreshed_at = None
+        self.cube = LedgerCube(G_LEntry_filtered)
+        self.period_totals = PeriodTotals(G_LEntry_filtered)
+        self.ledger_filter = LedgerFilter(G_LEntry_filtered)
+        self.aggregates = AggregationCache()
+        self.key_indexes = KeyIndexCache()
+
+    def covers(self, columns):
+        """Whether every database column of ``columns`` (``None``: every column) is loaded."""
+        if self.columns is None:
+            return True
+        # As IncrementalLedgerLoader.widen: columns neither table has, and derived ones, are never loaded
+        wanted = self.sources if columns is None else columns
+        return all(column in self.columns for column in wanted if column in self.sources and column not in DERIVED_COLUMNS)
+
+
+class SharedLedger:
+    """Process-wide ledger data, so sessions don't each hold their own copy.
+
+    One loader and dataset is kept per investment type mapping. A request
+    for columns the dataset lacks widens it (see
+    ``IncrementalLedgerLoader.widen``) rather than loading another copy,
+    so every session of a mapping shares one frame. Refreshes of a
+    mapping are serialised and swap in a new ``LedgerDataset`` so readers
+    never see a partial update; other mappings don't wait for them. At
+    most ``max_datasets`` mappings are held. ``clock`` stamps
+    ``LedgerDataset.refreshed_at``.
+    """
+
+    def __init__(self, cache=None, max_datasets=4, clock=time.time):
+        self.cache = cache if cache is not None else LedgerCache()
+        self.max_datasets = max_datasets
+        self.clock = clock
+        self._lock = threading.Lock()
+        # {spec: (loader, lock)}, the lock serialising that mapping's pulls
+        self._loaders = OrderedDict()
+        self._datasets = {}
+
+    @staticmethod
+    def spec_for(investment_type_mapping):
+        return tuple(sorted(investment_type_mapping.items()))
+
+    def current(self, columns, investment_type_mapping):
+        """The last ``LedgerDataset`` for this mapping if it has ``columns``, or ``None``; never waits on a refresh."""
+        dataset = self._datasets.get(self.spec_for(investment_type_mapping))
+        if dataset is None or not dataset.covers(columns):
+            return None
+        return dataset
+
+    def refresh(self, connection, columns, investment_type_mapping):
+        """Fetch new entries for this mapping, widened to ``columns``, and return its current ``LedgerDataset``."""
+        spec = self.spec_for(investment_type_mapping)
+
+        with self._lock:
+            held = self._loaders.get(spec)
+            if held is None:
+                loader = IncrementalLedgerLoader(
+                    cache=self.cache, columns=columns, investment_type_mapping=investment_type_mapping
+                )
+                held = (loader, threading.Lock())
+                self._loaders[spec] = held
+            self._loaders.move_to_end(spec)
+
+            while len(self._loaders) > self.max_datasets:
+                evicted, _ = self._loaders.popitem(last=False)
+                self._datasets.pop(evicted, None)
+
+        loader, pull_lock = held
+        with pull_lock:
+            G_LEntry_filtered = loader.refresh(connection)
+            widened = loader.widen(connection, columns)
+            if widened:
+                G_LEntry_filtered = loader.snapshot.copy(deep=False)
+            dataset = self._datasets.get(spec)
+            if dataset is None or widened or dataset.high_water_mark != loader.high_water_mark:
+                dataset = LedgerDataset(loader, G_LEntry_filtered)
+            dataset.refreshed_at = self.clock()
+            with self._lock:
+                # A mapping evicted while it was being pulled isn't put back
+                if self._loaders.get(spec) is held:
+                    self._datasets[spec] = dataset
+        return dataset
+
+
+@st.cache_resource
+def get_shared_ledger():
+    """The ``SharedLedger`` for this Streamlit process."""
+    return SharedLedger()
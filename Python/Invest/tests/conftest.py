@@ -0,0 +1,71 @@
+import os
+import sqlite3
+import sys
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from invest_common.ledger import GL_ENTRY_EXT_TABLE, GL_ENTRY_TABLE, enrich_ledger
+
+# Accounts of the stand-in ledger: two investment accounts and one that isn't mapped
+ACCOUNTS = ["120-0004", "120-0009", "200-0001"]
+
+# Quoted Equities has no entries until a test adds some
+INVESTMENT_TYPES = {"120-0004": "OffShore", "120-0009": "Corporate Bonds", "120-0006": "Quoted Equities"}
+
+
+class LedgerDatabase:
+    """SQLite stand-in for the two G/L Entry tables, in a file so each connection sees the same rows."""
+
+    def __init__(self, path):
+        self.path = path
+        with closing(self.connect()) as connection, connection:
+            connection.execute(
+                f"CREATE TABLE {GL_ENTRY_TABLE} ([Entry No_] INTEGER, [G_L Account No_] TEXT, [PDateExt] TEXT, "
+                f"[AmtExt] REAL, [Document No_] TEXT, [timestamp] INTEGER)"
+            )
+            connection.execute(
+                f"CREATE TABLE {GL_ENTRY_EXT_TABLE} ([Entry No_] INTEGER, [G_L Account No_] TEXT, [Dimension] TEXT, "
+                f"[timestamp] INTEGER)"
+            )
+
+    def connect(self):
+        return sqlite3.connect(self.path, check_same_thread=False)
+
+    def add_entries(self, start, count, account=None, document=None):
+        """Entries ``start`` to ``start + count - 1``, cycling through the accounts unless one is given."""
+        with closing(self.connect()) as connection, connection:
+            for entry_no in range(start, start + count):
+                entry_account = account or ACCOUNTS[entry_no % len(ACCOUNTS)]
+                connection.execute(
+                    f"INSERT INTO {GL_ENTRY_TABLE} VALUES (?, ?, ?, ?, ?, ?)",
+                    (entry_no, entry_account, f"2024-{entry_no % 12 + 1:02d}-01", float(entry_no),
+                     document or f"DOC{entry_no % 3}", entry_no)
+                )
+                connection.execute(
+                    f"INSERT INTO {GL_ENTRY_EXT_TABLE} VALUES (?, ?, ?, ?)", (entry_no, entry_account, "A", -entry_no)
+                )
+
+
+@pytest.fixture
+def ledger_db(tmp_path):
+    database = LedgerDatabase(str(tmp_path / "ledger.db"))
+    database.add_entries(1, 30)
+    return database
+
+
+def random_ledger(entries=400, seed=0):
+    """An enriched ledger over three years of random entries, a few of them without a posting date."""
+    rng = np.random.default_rng(seed)
+    dates = pd.Series(pd.date_range("2021-11-01", "2024-12-31", periods=entries).strftime("%Y-%m-%d"))
+    dates[rng.random(entries) < 0.05] = None
+    raw = pd.DataFrame({
+        'Entry No_': np.arange(1, entries + 1),
+        'G_L Account No_': rng.choice(list(INVESTMENT_TYPES) + ACCOUNTS, entries),
+        'PDateExt': dates,
+        'AmtExt': rng.normal(1_000, 5_000, entries).round(2),
+    })
+    return enrich_ledger(raw, INVESTMENT_TYPES)
@@ -0,0 +1,29 @@
+import pandas as pd
+import pytest
+
+from invest_common.aggregates import AggregationCache, aggregate_many, aggregate_report_data
+from invest_common.dtypes import optimize_dtypes
+
+LEDGER = pd.DataFrame({
+    'Year': [2023, 2023, 2023, 2024, 2024, 2024],
+    'Document No_': ["DOC2", "DOC1", "DOC2", None, "DOC3", "DOC1"],
+    'AmtExt': [10.0, 20.0, 30.0, 40.0, 50.0, 60.0],
+})
+
+
+@pytest.mark.parametrize("operator", ["MIN", "MAX"])
+def test_min_max_of_compacted_text(operator):
+    compacted, _ = optimize_dtypes(LEDGER)
+    assert isinstance(compacted['Document No_'].dtype, pd.CategoricalDtype)
+    expected = aggregate_report_data(LEDGER, 'Year', 'Document No_', operator)
+
+    result = aggregate_report_data(compacted, 'Year', 'Document No_', operator)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+    many = aggregate_many(compacted, 'Year', [('Document No_', operator), ('AmtExt', 'SUM')])
+    pd.testing.assert_frame_equal(many[('Document No_', operator)], expected, check_dtype=False)
+
+    # The prefetch computes it rather than leaving it to each report
+    cache = AggregationCache()
+    cache.prefetch(compacted, [('Year', 'Document No_', operator)], None)
+    assert len(cache) == 1
@@ -0,0 +1,106 @@
+import os
+import threading
+
+import pytest
+
+from invest_common import catalog as catalog_module
+from invest_common.cache import LedgerCache
+from invest_common.catalog import TableCatalog, check_table_budget
+from invest_common.db import ConnectionPool
+from invest_common.ledger import GL_ENTRY_EXT_TABLE, GL_ENTRY_TABLE
+
+TABLES = {"G/L Entry": GL_ENTRY_TABLE, "G/L Entry Extension": GL_ENTRY_EXT_TABLE, "Missing": "[Missing Table]"}
+
+
+def test_catalog_reads_metadata_without_loading(ledger_db, tmp_path):
+    cache_dir = str(tmp_path / "tables")
+    catalog = TableCatalog(ConnectionPool(ledger_db.connect), cache=LedgerCache(cache_dir), tables=TABLES)
+
+    overview = catalog.overview()
+    assert overview['Table'].tolist() == ["G/L Entry", "G/L Entry Extension"]
+    assert overview['Rows'].tolist() == [30, 30]
+    assert "Missing" in catalog.errors
+    assert not os.path.exists(cache_dir)
+
+    table = catalog.load("G/L Entry")
+    assert len(table) == 30
+    assert catalog.load("G/L Entry") is table
+    assert len(os.listdir(cache_dir)) == 1
+
+
+def test_catalog_stays_readable_while_a_table_loads(ledger_db, tmp_path):
+    cache = LedgerCache(str(tmp_path / "tables"))
+    catalog = TableCatalog(ConnectionPool(ledger_db.connect), cache=cache, tables=TABLES)
+    catalog.names()
+
+    pulling = threading.Event()
+    release = threading.Event()
+    fetch = catalog._fetch
+
+    def slow_fetch(connection, info):
+        if info.name == "G/L Entry":
+            pulling.set()
+            release.wait(5)
+        return fetch(connection, info)
+
+    catalog._fetch = slow_fetch
+    loader = threading.Thread(target=catalog.load, args=("G/L Entry",))
+    loader.start()
+    try:
+        assert pulling.wait(5)
+        # Metadata and other tables don't wait for the pull
+        results = []
+
+        def read_catalog():
+            catalog.clock = lambda: float("inf")
+            results.append(catalog.names())
+            results.append(len(catalog.load("G/L Entry Extension")))
+
+        reader = threading.Thread(target=read_catalog)
+        reader.start()
+        reader.join(2)
+        assert not reader.is_alive()
+        assert results == [["G/L Entry", "G/L Entry Extension"], 30]
+    finally:
+        release.set()
+        loader.join()
+
+
+def test_catalog_refuses_tables_over_the_budget(ledger_db, tmp_path):
+    cache_dir = str(tmp_path / "tables")
+    catalog = TableCatalog(ConnectionPool(ledger_db.connect), cache=LedgerCache(cache_dir), tables=TABLES, max_bytes=1)
+
+    info = catalog.info()["G/L Entry"]
+    assert info.estimated_bytes == 30 * info.row_bytes > 0
+    assert check_table_budget(info)[0] == "success"
+    assert check_table_budget(info, warn_bytes=1)[0] == "warning"
+    with pytest.raises(ValueError, match="refused"):
+        catalog.load("G/L Entry")
+    assert not os.path.exists(cache_dir)
+
+
+def test_stale_schemas_are_served_while_read_again(ledger_db, tmp_path, monkeypatch):
+    catalog = TableCatalog(ConnectionPool(ledger_db.connect), cache=LedgerCache(str(tmp_path / "tables")), tables=TABLES)
+    first = catalog.info()
+
+    reading = threading.Event()
+    release = threading.Event()
+    read = catalog_module.read_table_info
+
+    def slow_read(connection, name, table):
+        reading.set()
+        release.wait(5)
+        return read(connection, name, table)
+
+    monkeypatch.setattr(catalog_module, "read_table_info", slow_read)
+    catalog.clock = lambda: float("inf")
+    refresher = threading.Thread(target=catalog.info)
+    refresher.start()
+    try:
+        assert reading.wait(5)
+        # Another reader gets the previous schemas instead of waiting for the database
+        assert catalog.info() is first
+    finally:
+        release.set()
+        refresher.join()
+    assert catalog.info() is not first
@@ -0,0 +1,53 @@
+import pytest
+
+from conftest import random_ledger
+from invest_common.cube import LedgerCube
+from invest_common.rollups import ROLLUP_GRAINS
+
+FILTERS = [
+    {}, {'investment_type': "OffShore"}, {'year': 2023}, {'month': 12}, {'quarter': "2024Q1"},
+    {'investment_type': "Corporate Bonds", 'year': 2022, 'month': 3},
+]
+
+
+def _filtered(ledger, investment_type='All', year='All', month='All', quarter='All'):
+    mask = ledger['AmtExt'].notna()
+    if investment_type != 'All':
+        mask &= ledger['Investment Type'] == investment_type
+    if year != 'All':
+        mask &= ledger['Year'] == year
+    if month != 'All':
+        mask &= ledger['Month'] == month
+    if quarter != 'All':
+        mask &= ledger['Quarter'].astype(str) == quarter
+    return ledger[mask.fillna(False)]
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+@pytest.mark.parametrize("grain", list(ROLLUP_GRAINS))
+@pytest.mark.parametrize("stat", ["sum", "mean", "min", "max"])
+def test_rollup_matches_groupby(grain, stat, filters):
+    ledger = random_ledger()
+    keys = ROLLUP_GRAINS[grain] + ['Investment Type']
+    expected = _filtered(ledger, **filters).groupby(keys, as_index=False, observed=True)['AmtExt'].agg(stat)
+
+    rollup = LedgerCube(ledger).rollup(grain, stat, **filters)
+
+    assert rollup[keys].astype(str).values.tolist() == expected[keys].astype(str).values.tolist()
+    assert rollup['AmtExt'].to_numpy() == pytest.approx(expected['AmtExt'].to_numpy())
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+@pytest.mark.parametrize("stat", ["sum", "mean", "min", "max"])
+def test_total_matches_filtered_rows(stat, filters):
+    ledger = random_ledger()
+    expected = _filtered(ledger, **filters)['AmtExt'].agg(stat)
+    assert LedgerCube(ledger).total(stat, **filters) == pytest.approx(expected)
+
+
+def test_undated_entries_count_towards_type_totals():
+    ledger = random_ledger()
+    assert ledger['Year'].isna().any()
+    by_type = LedgerCube(ledger).rollup('type')
+    expected = ledger.groupby('Investment Type', observed=True)['AmtExt'].sum()
+    assert by_type.set_index('Investment Type')['AmtExt'].to_dict() == pytest.approx(expected.to_dict())
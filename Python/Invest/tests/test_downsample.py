@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from invest_common.downsample import lttb_indices, reduce_chart_data
+
+
+def _series(rows=5_000, seed=0):
+    rng = np.random.default_rng(seed)
+    x = np.arange(rows, dtype='float64')
+    return x, np.cumsum(rng.normal(size=rows))
+
+
+@pytest.mark.parametrize("points", [3, 10, 499])
+def test_lttb_keeps_the_ends_within_the_budget(points):
+    x, y = _series()
+    kept = lttb_indices(x, y, points)
+    assert len(kept) == points
+    assert kept[0] == 0 and kept[-1] == len(x) - 1
+    assert (np.diff(kept) > 0).all()
+
+
+def test_lttb_keeps_short_lines_whole():
+    x, y = _series(rows=20)
+    assert lttb_indices(x, y, 50).tolist() == list(range(20))
+
+
+def test_line_chart_is_downsampled_in_x_order():
+    x, y = _series()
+    y_data = pd.DataFrame({'Entry No_': x[::-1], 'AmtExt': y[::-1]})
+    reduced, note = reduce_chart_data(y_data, "Line Chart", 'Entry No_', 'AmtExt', "SUM", max_points=100)
+    assert len(reduced) == 100
+    assert reduced['Entry No_'].iloc[0] == x[0] and reduced['Entry No_'].iloc[-1] == x[-1]
+    assert reduced['Entry No_'].is_monotonic_increasing
+    assert "LTTB" in note
+
+
+@pytest.mark.parametrize("operator", ["SUM", "COUNT"])
+def test_bins_keep_the_total(operator):
+    x, y = _series()
+    y_data = pd.DataFrame({'Entry No_': x, 'AmtExt': y})
+    reduced, note = reduce_chart_data(y_data, "Bar Chart", 'Entry No_', 'AmtExt', operator, max_points=50)
+    assert len(reduced) <= 50
+    assert reduced['AmtExt'].sum() == pytest.approx(y.sum())
+    assert reduced['Entry No_'].iloc[0] == x[0]
+
+
+def test_dates_are_binned_as_dates():
+    dates = pd.Series(pd.date_range("2020-01-01", periods=1_000, freq="D")).astype('datetime64[s]')
+    y_data = pd.DataFrame({'PDateExt': dates, 'AmtExt': np.ones(len(dates))})
+    reduced, _ = reduce_chart_data(y_data, "Bar Chart", 'PDateExt', 'AmtExt', "SUM", max_points=10)
+    assert reduced['PDateExt'].dtype == dates.dtype
+    assert reduced['PDateExt'].iloc[0] == dates.iloc[0]
+    assert reduced['AmtExt'].sum() == len(dates)
+
+
+@pytest.mark.parametrize("operator, combine", [("SUM", "sum"), ("MAX", "max"), ("AVERAGE", "mean")])
+def test_text_axes_keep_the_top_values_and_other(operator, combine):
+    rng = np.random.default_rng(1)
+    y_data = pd.DataFrame({'Document No_': [f"DOC{i}" for i in range(800)], 'AmtExt': rng.normal(0, 100, 800)})
+    reduced, note = reduce_chart_data(y_data, "Bar Chart", 'Document No_', 'AmtExt', operator, max_points=20)
+
+    assert len(reduced) == 20
+    assert reduced['Document No_'].iloc[-1] == 'Other'
+    top = y_data['AmtExt'].abs().nlargest(19).index
+    assert set(reduced['Document No_'].iloc[:-1]) == set(y_data['Document No_'][top])
+    rest = y_data['AmtExt'].drop(index=top)
+    assert reduced['AmtExt'].iloc[-1] == pytest.approx(rest.agg(combine))
+    if operator == "SUM":
+        assert reduced['AmtExt'].sum() == pytest.approx(y_data['AmtExt'].sum())
+
+
+def test_small_results_are_left_alone():
+    y_data = pd.DataFrame({'Year': [2022, 2023], 'AmtExt': [1.0, 2.0]})
+    reduced, note = reduce_chart_data(y_data, "Pie Chart", 'Year', 'AmtExt', "SUM")
+    assert reduced is y_data and note is None
@@ -0,0 +1,27 @@
+import pandas as pd
+
+from invest_common.dtypes import concat_rows, optimize_dtypes
+
+
+def test_concat_rows_keeps_new_values_of_non_categorical_chunks():
+    first, _ = optimize_dtypes(pd.DataFrame({'Document No_': ['DOC1', 'DOC1', 'DOC2', 'DOC2']}))
+    second, _ = optimize_dtypes(pd.DataFrame({'Document No_': ['NEWDOC']}))
+    assert isinstance(first['Document No_'].dtype, pd.CategoricalDtype)
+    assert not isinstance(second['Document No_'].dtype, pd.CategoricalDtype)
+
+    combined = concat_rows([first, second])
+
+    assert isinstance(combined['Document No_'].dtype, pd.CategoricalDtype)
+    assert combined['Document No_'].tolist() == ['DOC1', 'DOC1', 'DOC2', 'DOC2', 'NEWDOC']
+    # The first chunk keeps its codes
+    assert combined['Document No_'].cat.codes[:4].tolist() == first['Document No_'].cat.codes.tolist()
+
+
+def test_concat_rows_unions_categories_in_first_seen_order():
+    first = pd.DataFrame({'Investment Type': pd.Categorical(['OffShore', 'Treasury Bills'])})
+    second = pd.DataFrame({'Investment Type': pd.Categorical(['Corporate Bonds', 'OffShore'])})
+
+    combined = concat_rows([first, second])
+
+    assert combined['Investment Type'].cat.categories.tolist() == ['OffShore', 'Treasury Bills', 'Corporate Bonds']
+    assert combined['Investment Type'].tolist() == ['OffShore', 'Treasury Bills', 'Corporate Bonds', 'OffShore']
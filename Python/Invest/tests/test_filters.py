@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+
+from conftest import random_ledger
+from invest_common.filters import LedgerFilter
+
+
+def _baseline(ledger, investment_type='All', year='All', month='All', quarter='All'):
+    # The boolean masking the sidebar did before LedgerFilter
+    filtered = ledger.copy()
+    if investment_type != 'All':
+        filtered = filtered[filtered['Investment Type'] == investment_type]
+    if year != 'All':
+        filtered = filtered[filtered['Year'] == year]
+    if month != 'All':
+        filtered = filtered[filtered['Month'] == month]
+    if quarter != 'All':
+        filtered = filtered[filtered['Quarter'].astype(str) == quarter]
+    return filtered
+
+
+@pytest.mark.parametrize("filters", [
+    {'investment_type': "OffShore"},
+    {'year': 2023},
+    {'month': 7},
+    {'quarter': "2022Q4"},
+    {'investment_type': "Corporate Bonds", 'year': 2024, 'month': 2, 'quarter': "2024Q1"},
+    {'year': 2024, 'quarter': "2023Q1"},
+    {'investment_type': "Not A Type"},
+    {'quarter': "1999Q1"},
+])
+def test_apply_matches_boolean_masks(filters):
+    ledger = random_ledger()
+    filtered = LedgerFilter(ledger).apply(ledger, **filters)
+    pd.testing.assert_frame_equal(filtered, _baseline(ledger, **filters))
+
+
+def test_unfiltered_ledger_is_not_copied():
+    ledger = random_ledger()
+    ledger_filter = LedgerFilter(ledger)
+    assert ledger_filter.apply(ledger, investment_type='All', year='All', month='All', quarter='All') is ledger
+    assert ledger_filter.positions(investment_type='All') is None
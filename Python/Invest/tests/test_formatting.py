@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from invest_common.formatting import format_large_numbers, format_number_labels
+
+
+@pytest.mark.parametrize("value, label", [
+    (0.0, "0.00"),
+    (12.346, "12.35"),
+    (999.99, "999.99"),
+    (999.996, "1.00K"),
+    (1_000.0, "1.00K"),
+    (-1_234.5, "-1.23K"),
+    (999_994.0, "999.99K"),
+    (-999_999.999, "-1.00M"),
+    (1_234_567.0, "1.23M"),
+    (999_999_999.0, "1.00B"),
+    (-2_500_000_000.0, "-2.50B"),
+    (-0.001, "0.00"),
+    (np.nan, ""),
+])
+def test_formatted_values(value, label):
+    assert format_large_numbers(value) == label
+
+
+@pytest.mark.parametrize("value, label", [
+    (0.0, "0"),
+    (999.5, "1,000"),
+    (-1_234_567.4, "-1,234,567"),
+    (-0.4, "0"),
+    (np.nan, ""),
+    (1e19, "10,000,000,000,000,000,000"),
+    (-1e19, "-10,000,000,000,000,000,000"),
+])
+def test_actual_values(value, label):
+    assert format_number_labels(np.asarray([value]), "Actual Values")[0] == label
+
+
+def test_columns_keep_their_index_and_whole_counts():
+    counts = pd.Series([0, 7, 999, 1_000, -5], index=list("abcde"))
+    labels = format_number_labels(counts)
+    assert labels.index.tolist() == list("abcde")
+    assert labels.tolist() == ["0", "7", "999", "1.00K", "-5"]
+
+    text = pd.Series(["DOC1", "DOC2"])
+    assert format_number_labels(text) is text
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import INVESTMENT_TYPES
+from invest_common.kpis import KPI_PERIODS, PeriodTotals, month_number, period_bounds, period_mask
+from invest_common.ledger import enrich_ledger
+
+TODAY = pd.Timestamp("2024-05-17")
+
+
+@pytest.fixture(scope="module")
+def ledger():
+    rng = np.random.default_rng(0)
+    entries = 400
+    dates = pd.Series(pd.date_range("2021-11-01", "2024-12-31", periods=entries).strftime("%Y-%m-%d"))
+    # Some entries have no posting date; they only count towards All Time
+    dates[rng.random(entries) < 0.05] = None
+    raw = pd.DataFrame({
+        'Entry No_': np.arange(1, entries + 1),
+        'G_L Account No_': rng.choice(list(INVESTMENT_TYPES) + ["200-0001"], entries),
+        'PDateExt': dates,
+        'AmtExt': rng.normal(1_000, 5_000, entries).round(2),
+    })
+    return enrich_ledger(raw, INVESTMENT_TYPES)
+
+
+def _months(data):
+    return month_number(data['Year'].to_numpy(dtype='float64', na_value=np.nan),
+                        data['Month'].to_numpy(dtype='float64', na_value=np.nan))
+
+
+def _sidebar_mask(data, investment_type='All', year='All', month='All', quarter='All'):
+    mask = np.ones(len(data), dtype=bool)
+    if investment_type != 'All':
+        mask &= (data['Investment Type'] == investment_type).to_numpy()
+    if year != 'All':
+        mask &= (data['Year'] == year).fillna(False).to_numpy()
+    if month != 'All':
+        mask &= (data['Month'] == month).fillna(False).to_numpy()
+    if quarter != 'All':
+        mask &= (data['Quarter'].astype(str) == quarter).to_numpy()
+    return mask
+
+
+@pytest.mark.parametrize("filters", [
+    {}, {'investment_type': "OffShore"}, {'year': 2024}, {'month': 5}, {'year': 2023, 'quarter': "2023Q2"},
+    {'investment_type': "Quoted Equities"},
+])
+@pytest.mark.parametrize("period", list(KPI_PERIODS))
+def test_period_totals_match_filtered_sums(ledger, period, filters):
+    totals = PeriodTotals(ledger)
+    selected = _sidebar_mask(ledger, **filters)
+    in_period = period_mask(ledger, period, TODAY)
+
+    for stat in ("sum", "mean"):
+        value, prior = totals.kpi(period, stat, today=TODAY, **filters)
+        expected = ledger['AmtExt'][selected & in_period].agg(stat)
+        if stat == "sum" or not np.isnan(expected):
+            assert value == pytest.approx(expected)
+        else:
+            assert np.isnan(value)
+
+        _, prior_range = period_bounds(period, TODAY)
+        if prior_range is None:
+            assert prior is None
+        else:
+            months = _months(ledger)
+            in_prior = (months >= prior_range[0]) & (months < prior_range[1])
+            expected_prior = ledger['AmtExt'][selected & in_prior].agg(stat)
+            assert prior == pytest.approx(expected_prior, nan_ok=True)
+
+
+def test_all_time_includes_undated_entries(ledger):
+    undated = ledger['Year'].isna()
+    assert undated.any()
+    assert period_mask(ledger, "All Time").all()
+    assert not period_mask(ledger, "Year to Date", TODAY)[undated.to_numpy()].any()
+    assert PeriodTotals(ledger).total() == pytest.approx(ledger['AmtExt'].sum())
@@ -0,0 +1,164 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from conftest import INVESTMENT_TYPES
+from invest_common.cache import LedgerCache
+from invest_common.db import ConnectionPool
+from invest_common.ledger import LEDGER_COLUMNS, IncrementalLedgerLoader
+from invest_common.refresh import LedgerRefresher
+from invest_common.shared import SharedLedger
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_refresh_appends_only_new_entries(ledger_db, tmp_path):
+    loader = IncrementalLedgerLoader(
+        cache=LedgerCache(str(tmp_path / "cache")), columns=LEDGER_COLUMNS + ['Document No_'],
+        investment_type_mapping=INVESTMENT_TYPES, chunk_size=7
+    )
+    connection = ledger_db.connect()
+    first = loader.refresh(connection)
+    assert loader.high_water_mark == 30
+    assert sorted(first['G_L Account No_'].unique()) == ["120-0004", "120-0009"]
+
+    # A one-row batch stays text, with a document and an investment type the snapshot hasn't seen
+    ledger_db.add_entries(31, 1, account="120-0006", document="NEWDOC")
+    second = loader.refresh(connection)
+
+    assert loader.high_water_mark == 31
+    assert len(second) == len(first) + 1
+    new_row = second[second['Entry No_'] == 31].iloc[0]
+    assert new_row['Document No_'] == 'NEWDOC'
+    assert new_row['Investment Type'] == 'Quoted Equities'
+    assert second['Investment Type'].notna().all()
+    assert second['Document No_'].notna().all()
+
+    # A cold start resumes from the cache with the same snapshot and memory report
+    restarted = IncrementalLedgerLoader(
+        cache=LedgerCache(str(tmp_path / "cache")), columns=LEDGER_COLUMNS + ['Document No_'],
+        investment_type_mapping=INVESTMENT_TYPES
+    )
+    pd.testing.assert_frame_equal(restarted.refresh(connection), second)
+    assert restarted.high_water_mark == 31
+    pd.testing.assert_frame_equal(restarted.memory_report, loader.memory_report, check_dtype=False)
+
+
+def test_columns_in_both_tables_are_qualified(ledger_db):
+    # timestamp is in both tables; timestamp_1 is the extension table's
+    loader = IncrementalLedgerLoader(columns=LEDGER_COLUMNS + ['timestamp', 'timestamp_1', 'Dimension', 'Gone'])
+    snapshot = loader.refresh(ledger_db.connect())
+
+    assert list(snapshot.columns) == LEDGER_COLUMNS + ['timestamp', 'timestamp_1', 'Dimension']
+    assert (snapshot['timestamp'] == snapshot['Entry No_']).all()
+    assert (snapshot['timestamp_1'] == -snapshot['Entry No_']).all()
+
+    # The same names as loading every column gives
+    everything = IncrementalLedgerLoader().refresh(ledger_db.connect())
+    pd.testing.assert_frame_equal(snapshot, everything[list(snapshot.columns)])
+
+
+def test_pool_replaces_broken_connections(ledger_db):
+    clock = FakeClock()
+    pool = ConnectionPool(ledger_db.connect, max_size=1, timeout=0.1, health_check_interval=10, clock=clock)
+
+    with pool.connection() as first:
+        pass
+    with pool.connection() as again:
+        assert again is first
+
+    # An idle connection that fails its health check is replaced
+    first.close()
+    clock.now += 60
+    with pool.connection() as replaced:
+        assert replaced is not first
+        replaced.execute("SELECT 1")
+
+    # A connection whose block raised is discarded instead of being reused
+    with pytest.raises(sqlite3.OperationalError):
+        with pool.connection() as failed:
+            failed.execute("SELECT * FROM missing_table")
+    with pool.connection() as fresh:
+        assert fresh is not failed
+
+    # The slot of a discarded connection is free again; a checked-out pool times out
+    held = pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire()
+    pool.release(held)
+
+
+def test_refresher_serves_stale_snapshot_while_revalidating(ledger_db, tmp_path):
+    clock = FakeClock()
+    database_up = [True]
+
+    def connect():
+        if not database_up[0]:
+            raise sqlite3.OperationalError("database is down")
+        return ledger_db.connect()
+
+    shared_ledger = SharedLedger(LedgerCache(str(tmp_path / "cache")), clock=clock)
+    refresher = LedgerRefresher(shared_ledger, ConnectionPool(connect), interval=60, background=False)
+
+    dataset = refresher.dataset(LEDGER_COLUMNS, INVESTMENT_TYPES)
+    assert dataset.refreshed_at == clock.now
+    ledger_db.add_entries(31, 3, account="120-0004")
+
+    # Within the interval the snapshot is served as is
+    clock.now += 30
+    assert refresher.dataset(LEDGER_COLUMNS, INVESTMENT_TYPES) is dataset
+    assert not refresher._wake.is_set()
+
+    # Once it is stale it is still served, and the worker is woken to refresh it
+    clock.now += 60
+    assert refresher.dataset(LEDGER_COLUMNS, INVESTMENT_TYPES) is dataset
+    assert refresher._wake.is_set()
+
+    refresher.refresh_all()
+    refreshed = refresher.dataset(LEDGER_COLUMNS, INVESTMENT_TYPES)
+    assert refreshed.high_water_mark == 33
+    assert refreshed.refreshed_at == clock.now
+    assert refresher.last_error is None
+
+    # A failed refresh keeps the previous snapshot and records the error
+    database_up[0] = False
+    refresher.pool.close()
+    clock.now += 120
+    refresher.refresh_all()
+    assert refresher.dataset(LEDGER_COLUMNS, INVESTMENT_TYPES) is refreshed
+    assert isinstance(refresher.last_error, sqlite3.OperationalError)
+
+
+def test_sessions_share_one_widened_dataset(ledger_db, tmp_path):
+    shared_ledger = SharedLedger(LedgerCache(str(tmp_path / "cache")))
+    connection = ledger_db.connect()
+    narrow = shared_ledger.refresh(connection, LEDGER_COLUMNS, INVESTMENT_TYPES)
+    assert 'Document No_' not in narrow.G_LEntry_filtered
+    assert shared_ledger.current(LEDGER_COLUMNS + ['Document No_'], INVESTMENT_TYPES) is None
+
+    # Another column set widens the same dataset instead of loading a second copy
+    wide = shared_ledger.refresh(connection, LEDGER_COLUMNS + ['Document No_', 'Dimension'], INVESTMENT_TYPES)
+    assert len(shared_ledger._loaders) == 1
+    assert shared_ledger.current(LEDGER_COLUMNS, INVESTMENT_TYPES) is wide
+    expected = IncrementalLedgerLoader(
+        columns=LEDGER_COLUMNS + ['Document No_', 'Dimension'], investment_type_mapping=INVESTMENT_TYPES
+    ).refresh(connection)
+    pd.testing.assert_frame_equal(wide.G_LEntry_filtered[list(expected.columns)], expected, check_dtype=False)
+
+    # New entries arrive with the widened columns
+    ledger_db.add_entries(31, 2, account="120-0004", document="NEWDOC")
+    refreshed = shared_ledger.refresh(connection, LEDGER_COLUMNS, INVESTMENT_TYPES)
+    assert refreshed.G_LEntry_filtered['Document No_'].iloc[-2:].tolist() == ["NEWDOC", "NEWDOC"]
+    assert refreshed.G_LEntry_filtered['Dimension'].notna().all()
+
+    # Loading every column widens it once more
+    everything = shared_ledger.refresh(connection, None, INVESTMENT_TYPES)
+    assert shared_ledger.current(None, INVESTMENT_TYPES) is everything
+    assert {'timestamp', 'timestamp_1'} <= set(everything.G_LEntry_filtered.columns)
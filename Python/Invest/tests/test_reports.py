@@ -0,0 +1,58 @@
+import json
+
+from invest_common.ledger import report_columns
+from invest_common.reports import load_report_state, load_reports, new_report, report_specs, save_reports
+
+
+def _session_state():
+    # Report 0 was a bar chart before it became a card, so it still has axis values
+    return {
+        'reports': [new_report(), new_report()],
+        'chart_type_0': "Card", 'card_name_0': "Total", 'column_0': "AmtExt", 'operator_0': "SUM",
+        'period_0': "Year to Date", 'x_axis_0': "Document No_", 'y_axis_0': "Dimension",
+        'show_data_labels_0': True,
+        'chart_type_1': "Bar Chart", 'x_axis_1': "Year", 'y_axis_1': "AmtExt", 'operator_1': "SUM",
+        'show_data_labels_1': False, 'label_format_1': "Formatted Values", 'column_1': "Description",
+        'report_open_1': True,
+    }
+
+
+def test_saved_reports_keep_only_their_chart_types_fields(tmp_path):
+    session_state = _session_state()
+    specs = report_specs(session_state)
+    assert specs == [
+        {'chart_type': "Card", 'card_name': "Total", 'column': "AmtExt", 'operator': "SUM", 'period': "Year to Date"},
+        {'chart_type': "Bar Chart", 'x_axis': "Year", 'y_axis': "AmtExt", 'operator': "SUM",
+         'show_data_labels': False, 'label_format': "Formatted Values"},
+    ]
+    assert report_columns(session_state) == ["AmtExt"]
+
+    path = str(tmp_path / "reports.json")
+    save_reports(path, specs)
+    assert load_reports(path) == specs
+    assert load_reports(path, chart_types=["Bar Chart"]) == specs[1:]
+
+    restored = {'reports': [new_report()], 'x_axis_0': "Entry No_", 'report_open_0': False}
+    load_report_state(path, restored)
+    assert len(restored['reports']) == 2
+    assert restored['reports_message'] == ("success", "Loaded 2 reports")
+    assert report_specs(restored) == specs
+    assert 'x_axis_0' not in restored and 'report_open_0' not in restored
+
+
+def test_stale_fields_in_old_files_are_not_restored(tmp_path):
+    path = tmp_path / "reports.json"
+    path.write_text(json.dumps([{'chart_type': "Card", 'column': "AmtExt", 'x_axis': "Document No_"}]))
+    session_state = {}
+    load_report_state(str(path), session_state)
+    assert session_state['column_0'] == "AmtExt"
+    assert 'x_axis_0' not in session_state
+
+
+def test_unreadable_report_file_is_reported(tmp_path):
+    path = tmp_path / "reports.json"
+    path.write_text("not json")
+    session_state = {'reports': [new_report()]}
+    load_report_state(str(path), session_state)
+    assert session_state['reports_message'][0] == "error"
+    assert len(session_state['reports']) == 1
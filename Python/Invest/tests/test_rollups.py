@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+
+from conftest import INVESTMENT_TYPES
+from invest_common.cube import LedgerCube
+from invest_common.ledger import LEDGER_COLUMNS, IncrementalLedgerLoader, ledger_column_sources
+from invest_common.rollups import ROLLUP_GRAINS, build_rollup_query, load_ledger_preview, load_rollup
+
+
+def _date_part(position):
+    return lambda text: None if text is None else int(text[:10].split('-')[position])
+
+
+@pytest.fixture
+def connection(ledger_db):
+    # SQL Server's YEAR and MONTH, which the rollup queries group by
+    connection = ledger_db.connect()
+    connection.create_function('YEAR', 1, _date_part(0))
+    connection.create_function('MONTH', 1, _date_part(1))
+    return connection
+
+
+@pytest.mark.parametrize("filters", [{}, {'investment_type': "OffShore"}, {'year': 2024, 'quarter': "2024Q2"}])
+@pytest.mark.parametrize("grain", list(ROLLUP_GRAINS))
+def test_server_rollup_matches_the_cube(connection, grain, filters):
+    ledger = IncrementalLedgerLoader(columns=LEDGER_COLUMNS, investment_type_mapping=INVESTMENT_TYPES).refresh(connection)
+    expected = LedgerCube(ledger).rollup(grain, **filters)
+
+    rollup = load_rollup(connection, grain, INVESTMENT_TYPES, **filters)
+
+    pd.testing.assert_frame_equal(
+        rollup.astype({'Investment Type': str}), expected.astype({'Investment Type': str}), check_dtype=False
+    )
+
+
+def test_ledger_preview_is_the_first_matching_entries(connection):
+    preview = load_ledger_preview(connection, INVESTMENT_TYPES, rows=5, investment_type="Corporate Bonds")
+    assert len(preview) == 5
+    assert (preview['Investment Type'] == "Corporate Bonds").all()
+    assert preview['Entry No_'].is_monotonic_increasing
+
+
+def test_rollup_columns_are_qualified(connection):
+    sql, _ = build_rollup_query('month', INVESTMENT_TYPES, ledger_column_sources(connection), year=2024)
+    assert "SUM(a.[AmtExt])" in sql
+    assert "YEAR(a.[PDateExt])" in sql
+    assert "MONTH(a.[PDateExt])" in sql